@@ -4,8 +4,10 @@ from PyQt5.QtWidgets import (QApplication, QWidget, QPushButton, QFileDialog,
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QPixmap, QIcon # Imported QIcon
 import json
-import re
 import os
+import sox_json
+import sox_names
+import sox_output
 
 class JSONTransformer(QWidget):
     def __init__(self):
@@ -145,7 +147,7 @@ V0.0.2
             # --- Encoding Fix + Better Error Handling ---
             # Specify encoding='utf-8' when opening the file
             with open(filename, 'r', encoding='utf-8') as f:
-                self.inputJson = json.load(f)
+                self.inputJson = sox_json.load(f)
             # --- End Fix ---
 
             # Check if the loaded data has the expected structure (at least 'conversation')
@@ -242,6 +244,7 @@ V0.0.2
         saved_count = 0
         failed_count = 0
         error_messages = []
+        names = sox_names.NameAllocator() # Characters with the same name get _1, _2... instead of overwriting
 
         # Process each character in the 'xouls' list
         for index, character_data in enumerate(xouls_list):
@@ -289,24 +292,19 @@ V0.0.2
                 if not character_name_slug:
                      character_name_slug = f"unknown_character_{index}" # Fallback name if name/slug missing
 
-                # Sanitize filename: remove invalid characters and replace spaces
-                filename_base = re.sub(r'[^\w\-_\. ]', '', character_name_slug)
-                filename_base = filename_base.replace(' ', '_')
-
-                # Ensure filename is not empty after sanitization
-                if not filename_base:
-                    filename_base = f"character_{index}"
+                # Sanitize filename (same rules as the hub), falling back to the index
+                filename_base = sox_names.sanitize(character_name_slug, f"character_{index}")
 
                 filename = f"{filename_base}.json"
-                full_path = os.path.join(directory, filename)
+                full_path = names.allocate(directory, filename)
 
                 # Ensure the target directory exists (moved outside loop for slight efficiency, but harmless here)
                 # os.makedirs(directory, exist_ok=True) # Already done before the loop
 
-                # Save the transformed JSON to the file
+                # Save the transformed JSON to the file (under a temporary name until complete)
                 # --- Encoding Fix + Indent ---
-                with open(full_path, 'w', encoding='utf-8') as f:
-                    json.dump(output_json, f, indent=4) # Use indent for readability
+                with sox_output.atomic_open(full_path, newline=None) as f:
+                    sox_json.dump(output_json, f, indent=4, ensure_ascii=True) # Use indent for readability
                 # --- End Fix ---
 
                 saved_count += 1
@@ -319,6 +317,10 @@ V0.0.2
                 # Print error to console for debugging
                 print(f"Error processing character {char_identifier}: {e}")
 
+        try:
+            sox_output.sync_pending() # Flush all the saved cards to disk in one go
+        except OSError as e:
+            print(f"Could not flush the saved files to disk: {e}")
 
         # Provide feedback to the user based on the results
         if saved_count > 0 and failed_count == 0:
@@ -6,6 +6,7 @@ from PyQt5.QtGui import QPixmap, QIcon
 import json
 import re
 import os # Make sure os is imported for os.path.basename
+import sox_json
 
 class JSONTransformer(QWidget):
     def __init__(self):
@@ -138,7 +139,7 @@ class JSONTransformer(QWidget):
         try:
             # --- Encoding Fix + Better Error Handling ---
             with open(filename, 'r', encoding='utf-8') as f:
-                self.inputJson = json.load(f)
+                self.inputJson = sox_json.load(f)
             # --- End Fix ---
 
             # --- Update state on success ---
@@ -242,7 +243,7 @@ class JSONTransformer(QWidget):
 
             # --- Encoding Fix + Indent ---
             with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(output_json, f, indent=4)
+                sox_json.dump(output_json, f, indent=4, ensure_ascii=True)
             # --- End Fix ---
 
             QMessageBox.information(self, "Success!", f"JSON transformed and saved successfully to:\n{filename}")
@@ -6,10 +6,10 @@ from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QPixmap, QIcon
 import json
 import os
-import requests
+import sox_cache
+import sox_engine
+import sox_json
 from urllib.parse import urlparse
-import re
-import hashlib
 
 class JSONTransformer(QWidget):
     def __init__(self):
@@ -180,7 +180,7 @@ V0.0.1
         try:
             # 3. Read and parse JSON - Added encoding and specific error handling
             with open(json_path, 'r', encoding='utf-8') as f:
-                json_data = json.load(f)
+                json_data = sox_json.load(f)
 
             # Basic check if it's a dictionary or list (most JSONs are one of these)
             if not isinstance(json_data, (dict, list)):
@@ -252,45 +252,6 @@ V0.0.1
                     found_urls.add(data)
 
 
-        def get_safe_filename_from_url(url, directory):
-            """Generates a safe and unique filename based on the URL in the directory."""
-            parsed_url = urlparse(url)
-            original_filename = os.path.basename(parsed_url.path)
-
-            if not original_filename:
-                 original_filename = "downloaded_image"
-
-            safe_filename = re.sub(r'[^\w\-_\.]', '_', original_filename)
-
-            if not safe_filename or all(c in '_.' for c in safe_filename):
-                 hash_object = hashlib.md5(url.encode()).hexdigest()
-                 safe_filename = f"hashed_image_{hash_object[:8]}"
-
-            if safe_filename.startswith('.'):
-                 safe_filename = '_' + safe_filename[1:]
-
-
-            name, ext = os.path.splitext(safe_filename)
-            common_extensions = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp', '.svg')
-            if not ext or ext.lower() not in common_extensions:
-                 if '.png' in url.lower(): ext = '.png'
-                 elif '.jpg' in url.lower() or '.jpeg' in url.lower(): ext = '.jpg'
-                 elif '.gif' in url.lower(): ext = '.gif'
-                 else: ext = ".png" # Default fallback
-
-                 safe_filename = f"{name}{ext}"
-
-
-            output_path = os.path.join(directory, safe_filename)
-
-            counter = 1
-            base_name, file_ext = os.path.splitext(output_path)
-            while os.path.exists(output_path):
-                output_path = f"{base_name}_{counter}{file_ext}"
-                counter += 1
-
-            return output_path
-
         # --- Main download execution ---
 
         found_urls = set() # Use a set to avoid duplicate URLs
@@ -312,56 +273,20 @@ V0.0.1
         # --- End progress bar setup ---
 
 
-        download_count = 0 # Count successful downloads
-        processed_urls_count = 0 # Count URLs attempted
-        failed_downloads = {} # Store failed URLs and reasons
+        def on_progress(processed_urls_count, total):
+            # --- Update progress bar ---
+            self.progressBar.setValue(processed_urls_count)
+            QApplication.processEvents() # Keep the GUI responsive by processing events
+            # --- End update ---
 
         QApplication.setOverrideCursor(Qt.WaitCursor) # Show busy cursor
         self.loadButton.setEnabled(False) # Disable button during download
 
         try:
-            for url in found_urls:
-                output_path = None
-                try:
-                    output_path = get_safe_filename_from_url(url, output_dir)
-
-                    # Use timeout and handle request errors
-                    response = requests.get(url, stream=True, timeout=15) # Increased timeout slightly
-                    response.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
-
-                    with open(output_path, 'wb') as f:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            f.write(chunk)
-
-                    download_count += 1
-                    print(f"Successfully downloaded: {url} -> {os.path.basename(output_path)}")
-
-                except requests.exceptions.Timeout:
-                     failed_downloads[url] = f"Timeout occurred after 15 seconds."
-                     print(f"Failed to download {url}: Timeout")
-                except requests.exceptions.ConnectionError as e:
-                    failed_downloads[url] = f"Connection error: {e}"
-                    print(f"Failed to download {url}: Connection error: {e}")
-                except requests.exceptions.HTTPError as e:
-                     failed_downloads[url] = f"HTTP error: {e.response.status_code} {e.response.reason}"
-                     print(f"Failed to download {url}: HTTP error: {e.response.status_code}")
-                except requests.exceptions.RequestException as e:
-                    failed_downloads[url] = f"Request error: {e}"
-                    print(f"Failed to download {url}: Request error: {e}")
-                except IOError as e:
-                    failed_downloads[url] = f"File writing error: {e} (Path: {output_path})"
-                    print(f"Failed to write file for {url}: {e} (Path: {output_path})")
-                except Exception as e:
-                    failed_downloads[url] = f"An unexpected error occurred during download: {e}"
-                    print(f"An unexpected error occurred while processing {url}: {e}")
-
-                finally:
-                    # --- Update progress bar ---
-                    processed_urls_count += 1
-                    self.progressBar.setValue(processed_urls_count)
-                    QApplication.processEvents() # Keep the GUI responsive by processing events
-                    # --- End update ---
-
+            # Parallel downloads over pooled keep-alive connections (see sox_engine.download_avatars)
+            download_count, failed_downloads = sox_engine.download_avatars(
+                found_urls, output_dir, sox_engine.Progress(on_progress), timeout=15,
+                cache=sox_cache.open_cache()) # Avatars from earlier runs are reused, not re-downloaded
         finally:
              QApplication.restoreOverrideCursor() # Restore cursor even if errors occur
              self.loadButton.setEnabled(True) # Re-enable button
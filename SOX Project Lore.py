@@ -6,6 +6,8 @@ from PyQt5.QtGui import QPixmap, QIcon
 import json
 import os
 import re # Need re for filename sanitization
+import sox_json
+import sox_log
 
 class JSONTransformer(QWidget):
     def __init__(self):
@@ -158,7 +160,7 @@ V0.0.1
             # --- Encoding Fix + Better Error Handling ---
             # Specify encoding='utf-8' when opening the file
             with open(filename, 'r', encoding='utf-8') as f:
-                loaded_data = json.load(f)
+                loaded_data = sox_json.load(f)
             # --- End Fix ---
 
             # Basic data structure check for Xoul Lorebook
@@ -249,7 +251,8 @@ V0.0.1
                 if not isinstance(section, dict):
                     failed_count += 1
                     error_messages.append(f"Skipping item at index {i}: Data is not a dictionary.")
-                    print(f"Error processing item at index {i}: Expected dictionary, got {type(section)}")
+                    sox_log.repeated("lorebook sections skipped", "Processing item at index %d: Expected dictionary, got %s",
+                                     i, type(section), level=sox_log.ERROR)
                     continue # Skip this item
 
                 try:
@@ -296,9 +299,12 @@ V0.0.1
                      # Identify the section by name or index
                      section_identifier = section.get("name", f"index_{i}")
                      error_messages.append(f"Failed to process section '{section_identifier}': {e}")
-                     print(f"Error processing section {section_identifier}: {e}")
+                     sox_log.repeated("lorebook sections skipped", "Processing section %s: %s", section_identifier, e,
+                                      level=sox_log.ERROR)
                      continue # Continue processing other sections
 
+            sox_log.flush(self._input_filename)
+
             # Assign the populated entries dictionary to the output structure
             output_json["entries"] = entries_dict
 
@@ -332,7 +338,7 @@ V0.0.1
             # --- Save the transformed JSON to the file ---
             # Use encoding='utf-8' and indent=4
             with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(output_json, f, indent=4) # Use indent=4 for readability
+                sox_json.dump(output_json, f, indent=4, ensure_ascii=True) # Use indent=4 for readability
             # --- End Fix ---
 
             # Provide feedback to the user based on the results
@@ -342,16 +348,12 @@ V0.0.1
             else:
                  QMessageBox.warning(self, "Partial Success",
                                      f"Successfully transformed and saved {saved_count} lorebook entries.\n"
-                                     f"Failed to process {failed_count} entries due to errors.")
+                                     f"Failed to process {failed_count} entries due to errors ({sox_log.details_hint()}).")
                  # Optionally show detailed errors
                  detail_msg = "Details:\n" + "\n".join(error_messages[:10]) # Show up to 10 errors
                  if len(error_messages) > 10:
-                      detail_msg += "\n..."
+                      detail_msg += f"\n... and {len(error_messages) - 10} more"
                  QMessageBox.information(self, "Processing Details", detail_msg)
-                 print("\n--- Processing Errors ---")
-                 for msg in error_messages:
-                      print(msg)
-                 print("-------------------------")
 
 
         # Catch specific errors during transformation/saving
@@ -6,6 +6,10 @@ from PyQt5.QtGui import QPixmap, QIcon
 import json
 import os
 import re
+import sox_engine
+import sox_json
+import sox_log
+import sox_output
 
 
 class JSONTransformer(QWidget):
@@ -162,7 +166,7 @@ V0.0.1
             # --- Encoding Fix + Better Error Handling ---
             # Specify encoding='utf-8' when opening the file
             with open(filename, 'r', encoding='utf-8') as f:
-                loaded_data = json.load(f)
+                loaded_data = sox_json.load(f)
             # --- End Fix ---
 
             # Basic data structure check for Xoul Multi-Chat
@@ -236,6 +240,9 @@ V0.0.1
             # Safely access lists (personas and xouls are under conversation, messages are top level)
             all_personas = conversation_data.get('personas', [])
             all_xouls = conversation_data.get('xouls', [])
+            # name -> icon_url, built once instead of scanning the lists for every message
+            persona_icons = sox_engine.build_avatar_index(all_personas)
+            xoul_icons = sox_engine.build_avatar_index(all_xouls)
             messages_list = self.inputJson.get('messages', []) # Messages are top level here!
 
             # Check if messages list is available and not empty
@@ -251,7 +258,7 @@ V0.0.1
             for i, message in enumerate(messages_list):
                  if not isinstance(message, dict):
                      failed_message_count += 1
-                     print(f"Skipping message at index {i}: Item is not a dictionary.")
+                     sox_log.repeated("messages skipped", "Skipping message at index %d: Item is not a dictionary.", i)
                      continue # Skip item if not a dict
 
                  try:
@@ -262,11 +269,13 @@ V0.0.1
 
                      # Skip messages with missing crucial data
                      if not all([author_name, author_type, timestamp is not None]):
-                          print(f"Skipping message due to missing author_name, author_type, or timestamp: {message.get('message_id', f'index_{i}')}")
+                          sox_log.repeated("messages skipped", "Skipping message due to missing author_name, author_type, or timestamp: %s",
+                                           message.get('message_id', f'index_{i}'))
                           failed_message_count += 1 # Count this as a failed message
                           continue
                      if content is None:
-                          print(f"Skipping message due to missing content: {message.get('message_id', f'index_{i}')}")
+                          sox_log.repeated("messages skipped", "Skipping message due to missing content: %s",
+                                           message.get('message_id', f'index_{i}'))
                           failed_message_count += 1 # Count this as a failed message
                           continue
 
@@ -282,15 +291,11 @@ V0.0.1
                      # --- Find AVATAR URL based on author_name and author_type ---
                      avatar_url = None
                      if author_type == 'user':
-                         # Search in all_personas
-                         found_entry = next((p for p in all_personas if isinstance(p, dict) and p.get('name') == author_name), None)
-                         if found_entry:
-                             avatar_url = found_entry.get('icon_url')
+                         # Look up in the personas (first entry wins on duplicate names)
+                         avatar_url = sox_engine.find_avatar_url(persona_icons, author_name)
                      elif author_type == 'llm': # Assuming any non-user is an 'llm' in this context
-                         # Search in all_xouls
-                         found_entry = next((x for x in all_xouls if isinstance(x, dict) and x.get('name') == author_name), None)
-                         if found_entry:
-                             avatar_url = found_entry.get('icon_url')
+                         # Look up in the xouls
+                         avatar_url = sox_engine.find_avatar_url(xoul_icons, author_name)
                      # If avatar_url is still None, it means the author wasn't found in the lists
                      # or the entry didn't have an 'icon_url'. It will output as null in JSON.
                      # -----------------------------------------------------------
@@ -310,15 +315,18 @@ V0.0.1
                  except Exception as e:
                      # Catch any errors during processing of a single message
                      failed_message_count += 1
-                     print(f"Error processing message at index {i}: {e}")
+                     sox_log.repeated("messages that failed to convert", "Processing message at index %d: %s", i, e,
+                                      level=sox_log.ERROR)
                      continue # Continue processing other messages
 
+            sox_log.flush(self._input_filename)
+
             # Check if any messages were successfully transformed
             successfully_converted_count = len(output_messages)
             if successfully_converted_count == 0 and len(messages_list) > 0:
                  # Only show this if there were *some* messages but none were converted
                  QMessageBox.warning(self, "Conversion Failed", "No messages were successfully processed from the chat JSON.")
-                 print("\n--- No messages converted ---")
+                 sox_log.error("No messages converted.")
                  # Optionally disable the button again if no output was produced? No, keep loaded info.
                  # if self.saveButton: self.saveButton.setEnabled(False)
                  # if self.loadedFileLabel: self.loadedFileLabel.setText("No file loaded") # Or keep loaded file info? Keep file info.
@@ -354,14 +362,15 @@ V0.0.1
 
 
             try:
-                 # Use encoding='utf-8' for writing JSON Lines
-                 # newline='' prevents Windows from adding extra \r
-                 with open(filename, 'w', encoding='utf-8', newline='') as f:
+                 # UTF-8 with newline='' (prevents Windows from adding extra \r), written under
+                 # a temporary name so a failed save never leaves a truncated file
+                 with sox_output.atomic_open(filename) as f:
                      for obj in output_messages:
-                         # json.dumps default indent is None, which is suitable for jsonl
-                         # ensure_ascii=False to keep non-ASCII characters like emojis etc.
-                         json.dump(obj, f, ensure_ascii=False)
+                         # sox_json.dump without indent writes compact JSON, one record per line
+                         # non-ASCII characters like emojis are written as they are, not escaped
+                         sox_json.dump(obj, f)
                          f.write('\n') # Write a newline after each JSON object
+                 sox_output.sync_pending()
 
                  # Provide feedback to the user based on the results
                  if failed_message_count == 0:
@@ -370,7 +379,7 @@ V0.0.1
                  else:
                      QMessageBox.warning(self, "Partial Success",
                                          f"Successfully converted and saved {successfully_converted_count} messages.\n"
-                                         f"Failed to process {failed_message_count} messages (see console for details).")
+                                         f"Failed to process {failed_message_count} messages ({sox_log.details_hint()}).")
 
 
             except IOError as e:
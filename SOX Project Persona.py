@@ -6,6 +6,7 @@ from PyQt5.QtGui import QPixmap, QIcon
 import json
 import os
 import re # Need re for filename sanitization
+import sox_json
 
 class JSONTransformer(QWidget):
     def __init__(self):
@@ -166,7 +167,7 @@ V0.0.1
         try:
             # --- Encoding Fix + Better Error Handling ---
             with open(filename, 'r', encoding='utf-8') as f:
-                loaded_data = json.load(f)
+                loaded_data = sox_json.load(f)
             # --- End Fix ---
 
             # Basic data structure check for TavernAI backup
@@ -224,7 +225,7 @@ V0.0.1
         try:
             # --- Encoding Fix + Better Error Handling ---
             with open(filename, 'r', encoding='utf-8') as f:
-                loaded_data = json.load(f)
+                loaded_data = sox_json.load(f)
             # --- End Fix ---
 
             # Basic data structure check for Xoul Persona
@@ -343,7 +344,7 @@ V0.0.1
             # --- Save the transformed JSON to the file ---
             # Use encoding='utf-8' and indent=4
             with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(output_data, f, indent=4)
+                sox_json.dump(output_data, f, indent=4, ensure_ascii=True)
 
             QMessageBox.information(self, "Success!", f"Persona added and modified backup saved successfully to:\n{filename}")
 
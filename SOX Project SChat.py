@@ -6,6 +6,8 @@ from PyQt5.QtGui import QPixmap, QIcon
 import json
 import os
 import re # Keep re, might be useful though not strictly needed for this transformation
+import sox_json
+import sox_log
 
 
 class JSONTransformer(QWidget):
@@ -162,7 +164,7 @@ V0.0.1
             # --- Encoding Fix + Better Error Handling ---
             # Specify encoding='utf-8' when opening the file
             with open(filename, 'r', encoding='utf-8') as f:
-                loaded_data = json.load(f)
+                loaded_data = sox_json.load(f)
             # --- End Fix ---
 
             # Basic data structure check for Xoul Chat
@@ -274,7 +276,7 @@ V0.0.1
             for i, message in enumerate(messages_list):
                  if not isinstance(message, dict):
                      failed_message_count += 1
-                     print(f"Skipping message at index {i}: Item is not a dictionary.")
+                     sox_log.repeated("messages skipped", "Skipping message at index %d: Item is not a dictionary.", i)
                      continue # Skip item if not a dict
 
                  try:
@@ -303,7 +305,7 @@ V0.0.1
                          # Handle unexpected roles - skip or assign a default name?
                          # Original code raised ValueError, let's log and skip for robustness.
                          failed_message_count += 1
-                         print(f"Skipping message at index {i}: Unexpected role '{role}'.")
+                         sox_log.repeated("messages skipped", "Skipping message at index %d: Unexpected role '%s'.", i, role)
                          continue # Skip message with unknown role
 
                      # Create the TavernAI chat message object
@@ -319,9 +321,12 @@ V0.0.1
                  except Exception as e:
                      # Catch any errors during processing of a single message
                      failed_message_count += 1
-                     print(f"Error processing message at index {i}: {e}")
+                     sox_log.repeated("messages that failed to convert", "Processing message at index %d: %s", i, e,
+                                      level=sox_log.ERROR)
                      continue # Continue processing other messages
 
+            sox_log.flush(self._input_filename)
+
             # Check if any messages were successfully transformed
             successfully_converted_count = len(output_messages)
             if successfully_converted_count == 0:
@@ -353,8 +358,8 @@ V0.0.1
                  # Use encoding='utf-8' for writing JSON Lines
                  with open(filename, 'w', encoding='utf-8') as f:
                      for obj in output_messages:
-                         # json.dumps default indent is None, which is suitable for jsonl
-                         json.dump(obj, f) # Dump the object as a single line JSON string
+                         # sox_json.dump without indent writes compact JSON, one record per line
+                         sox_json.dump(obj, f, ensure_ascii=True) # Dump the object as a single line JSON string
                          f.write('\n') # Write a newline after each JSON object
 
                  # Provide feedback to the user based on the results
@@ -364,7 +369,7 @@ V0.0.1
                  else:
                      QMessageBox.warning(self, "Partial Success",
                                          f"Successfully converted and saved {successfully_converted_count} messages.\n"
-                                         f"Failed to process {failed_message_count} messages (see console for details).")
+                                         f"Failed to process {failed_message_count} messages ({sox_log.details_hint()}).")
 
 
             except IOError as e:
@@ -6,6 +6,7 @@ from PyQt5.QtGui import QPixmap, QIcon # Imported QIcon
 import json
 import os
 import re # Need re for filename sanitization
+import sox_json
 
 class JSONTransformer(QWidget):
     def __init__(self):
@@ -158,7 +159,7 @@ V0.0.1
             # --- Encoding Fix + Better Error Handling ---
             # Specify encoding='utf-8' when opening the file
             with open(filename, 'r', encoding='utf-8') as f:
-                loaded_data = json.load(f)
+                loaded_data = sox_json.load(f)
             # --- End Fix ---
 
             # Basic data structure check for Xoul Scenario
@@ -323,7 +324,7 @@ V0.0.1
 
             # --- Encoding Fix + Indent ---
             with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(output_json, f, indent=4) # Use indent=4 for readability
+                sox_json.dump(output_json, f, indent=4, ensure_ascii=True) # Use indent=4 for readability
             # --- End Fix ---
 
             QMessageBox.information(self, "Success!", f"JSON transformed and saved successfully to:\n{filename}")
@@ -6,6 +6,7 @@ from PyQt5.QtGui import QPixmap, QIcon
 import json
 import os
 import re # Import re module for filename sanitization
+import sox_json
 
 class JSONTransformer(QWidget):
     def __init__(self):
@@ -168,7 +169,7 @@ V0.0.1
             # --- Encoding Fix + Better Error Handling ---
             # Specify encoding='utf-8' when opening the file
             with open(filename, 'r', encoding='utf-8') as f:
-                loaded_data = json.load(f)
+                loaded_data = sox_json.load(f)
             # --- End Fix ---
 
             # Basic data structure check for Xoul Chat Scenario
@@ -391,7 +392,7 @@ V0.0.1
             # --- Save the transformed JSON to the file ---
             # Use encoding='utf-8' and indent=4 for readability
             with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(output_json, f, indent=4) # Use indent=4 for readability
+                sox_json.dump(output_json, f, indent=4, ensure_ascii=True) # Use indent=4 for readability
             # --- End Fix ---
 
             QMessageBox.information(self, "Success!", f"JSON transformed and saved successfully to:\n{filename}")
@@ -0,0 +1,80 @@
+"""Load time and pixel memory of the hub's header images, per-page loading vs sox_assets.
+
+    python benchmarks/bench_assets.py [--pages N] [--repeat R]
+
+"per page" does what every hub page used to do (QPixmap('SOX.png') into its
+own label); "shared" goes through sox_assets. Qt's own QPixmapCache already
+dedupes file loads while it has room (10 MB by default), so "per page,
+no QPixmapCache" shows the cost once it has evicted them. Memory is
+the decoded pixel data actually held by the labels, counting each distinct
+pixmap once. Runs offscreen; needs PyQt5.
+"""
+import argparse
+import os
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt5.QtGui import QPixmap, QPixmapCache # noqa: E402
+from PyQt5.QtWidgets import QApplication, QLabel # noqa: E402
+
+import sox_assets # noqa: E402
+
+HEADER = "SOX.png"
+PAGES = 10 # main menu + the nine tool pages
+
+
+def build_labels(load, pages):
+    labels = []
+    for _ in range(pages):
+        label = QLabel()
+        label.setPixmap(load())
+        labels.append(label)
+    return labels
+
+
+def pixel_bytes(labels):
+    distinct = {}
+    for label in labels:
+        pixmap = label.pixmap()
+        distinct[pixmap.cacheKey()] = pixmap.width() * pixmap.height() * pixmap.depth() // 8
+    return len(distinct), sum(distinct.values())
+
+
+def measure(name, load, pages, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        sox_assets.clear()
+        start = time.perf_counter()
+        labels = build_labels(load, pages)
+        best = min(best, time.perf_counter() - start)
+    copies, size = pixel_bytes(labels)
+    print(f"  {name:<27} {best * 1000:8.2f} ms   {copies:3d} decoded copies   {size / 1024:9.1f} KiB of pixels")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=PAGES, help="labels showing the header")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per variant (best time is reported)")
+    args = parser.parse_args(argv)
+
+    os.chdir(REPO_DIR) # The hub loads its images relative to the working directory
+    app = QApplication(sys.argv) # Pixmaps need a QApplication
+    if QPixmap(HEADER).isNull():
+        print(f"Could not load {HEADER}")
+        return 1
+    print(f"{HEADER} shown on {args.pages} pages, best of {args.repeat}:")
+    measure("per page", lambda: QPixmap(HEADER), args.pages, args.repeat)
+    measure("shared", lambda: sox_assets.pixmap(HEADER), args.pages, args.repeat)
+    QPixmapCache.setCacheLimit(0)
+    measure("per page, no QPixmapCache", lambda: QPixmap(HEADER), args.pages, args.repeat)
+    measure("shared, no QPixmapCache", lambda: sox_assets.pixmap(HEADER), args.pages, args.repeat)
+    app.processEvents()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""Throughput, peak memory and output size of every batch converter, on synthetic exports.
+
+    python benchmarks/bench_converters.py [--messages N] [--sections N] [--repeat R] [--stream]
+                                          [--save BASELINE.json] [--compare BASELINE.json [--tolerance PCT]]
+
+Inputs come from synth_exports (same seed, same documents). Each converter
+runs in a fresh interpreter that loads its input with sox_engine.load_json,
+converts it and writes the outputs with sox_engine.save_json, like one
+sox_cli input; chat messages are converted while they are written, so
+"convert" includes writing. Times are the best of --repeat runs; peak RSS
+is the child's high-water mark (Unix only) next to its RSS right after
+importing, so their difference is what loading and converting cost.
+
+--save stores the results (with the sizes, Python version and JSON backend
+used) as a JSON baseline; --compare reruns with the baseline's sizes and
+reports the change per converter, exiting with 1 if any got slower than
+the tolerance allows. Baselines only compare well on the same machine.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+import sox_json # noqa: E402
+import synth_exports # noqa: E402
+
+# converter -> the synth_exports file it reads
+CASES = {
+    "character": "character.json",
+    "scenario": "scenario.json",
+    "lorebook": "lorebook.json",
+    "single_chat": "single_chat.json",
+    "multi_chat": "group_chat.json",
+    "char_extract": "group_chat.json",
+    "chat_scenario_extract": "single_chat.json",
+    "account_migration": "single_chat.json",
+}
+CHAT_INPUTS = ("single_chat.json", "group_chat.json")
+
+
+def _peak_rss():
+    if resource is None: return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024 # bytes on macOS, KiB elsewhere
+
+
+def run_child(name, path, repeat, stream):
+    """Runs in the child: loads, converts and writes `path` `repeat` times; returns its measurements."""
+    import sox_engine
+    base_rss = _peak_rss()
+    best_load = best_convert = float('inf')
+    with tempfile.TemporaryDirectory(prefix="sox-bench-") as output_dir:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            stream_key = "messages" if stream and os.path.basename(path) in CHAT_INPUTS else None
+            data = sox_engine.load_json(path, stream_key)
+            loaded = time.perf_counter()
+            result = sox_engine.BATCH_CONVERTERS[name](data, path)
+            output_bytes = 0
+            for i, output in enumerate(result.outputs):
+                output_path = os.path.join(output_dir, f"{i}_{output.name}")
+                sox_engine.save_json(output.data, output_path, is_jsonl=output.is_jsonl)
+                output_bytes += os.path.getsize(output_path)
+            done = time.perf_counter()
+            best_load, best_convert = min(best_load, loaded - start), min(best_convert, done - loaded)
+            items = result.item_count # final only once the outputs are written
+            del data, result
+    return {"load_s": best_load, "convert_s": best_convert, "items": items,
+            "input_bytes": os.path.getsize(path), "output_bytes": output_bytes,
+            "base_rss": base_rss, "peak_rss": _peak_rss()}
+
+
+def measure(name, path, repeat, stream):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", name, path,
+                             "--repeat", str(repeat)] + (["--stream"] if stream else []),
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _mb(value):
+    return "n/a" if value is None else f"{value / 1e6:.1f}"
+
+
+def print_results(results):
+    print(f"  {'converter':<22} {'items/s':>11} {'MB/s in':>8} {'load ms':>8} {'conv ms':>8}"
+          f" {'RSS MB':>7} {'+RSS MB':>8} {'out MB':>7}")
+    for name, r in results.items():
+        total = r["load_s"] + r["convert_s"]
+        grown = None if r["peak_rss"] is None else r["peak_rss"] - r["base_rss"]
+        print(f"  {name:<22} {r['items'] / total:>11,.0f} {r['input_bytes'] / total / 1e6:>8.1f}"
+              f" {r['load_s'] * 1000:>8.1f} {r['convert_s'] * 1000:>8.1f}"
+              f" {_mb(r['peak_rss']):>7} {_mb(grown):>8} {r['output_bytes'] / 1e6:>7.2f}")
+
+
+def compare(results, baseline, tolerance):
+    """Prints the change against a baseline; returns the converters that got slower than `tolerance` %."""
+    slower = []
+    print(f"\nCompared with the baseline from {baseline.get('date', '?')}:")
+    for name, r in results.items():
+        old = baseline["results"].get(name)
+        if old is None:
+            print(f"  {name:<22} (not in the baseline)")
+            continue
+        ratio = (r["load_s"] + r["convert_s"]) / (old["load_s"] + old["convert_s"])
+        change = (ratio - 1) * 100
+        notes = []
+        if r["peak_rss"] is not None and old.get("peak_rss"):
+            notes.append(f"peak RSS {(r['peak_rss'] - old['peak_rss']) / 1e6:+.1f} MB")
+        if r["output_bytes"] != old["output_bytes"]:
+            notes.append(f"output {r['output_bytes'] - old['output_bytes']:+,} bytes")
+        flag = "SLOWER" if change > tolerance else "faster" if change < -tolerance else "same"
+        print(f"  {name:<22} {change:+7.1f}% time  {flag:<6}  {', '.join(notes)}")
+        if change > tolerance: slower.append(name)
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000, help="messages per chat backup")
+    parser.add_argument("--sections", type=int, default=2000, help="lorebook sections")
+    parser.add_argument("--xouls", type=int, default=4, help="xouls in the group chat")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per converter (best is reported)")
+    parser.add_argument("--stream", action="store_true", help="stream chat messages instead of loading them")
+    parser.add_argument("--only", nargs="+", choices=sorted(CASES), help="converters to run (default: all)")
+    parser.add_argument("--save", metavar="PATH", help="write the results to this JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare with a baseline saved earlier (uses its sizes)")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="percent slower that counts as a regression")
+    parser.add_argument("--child", nargs=2, metavar=("CONVERTER", "INPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_child(*args.child, args.repeat, args.stream)))
+        return 0
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        for key, value in baseline["sizes"].items(): setattr(args, key, value)
+        args.stream, args.repeat = baseline.get("stream", False), baseline.get("repeat", args.repeat)
+    sizes = {"messages": args.messages, "sections": args.sections, "xouls": args.xouls, "seed": args.seed}
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="sox-bench-inputs-") as input_dir:
+        # In a child too: on Linux a process starts with the peak RSS of the one that started it
+        subprocess.run([sys.executable, synth_exports.__file__, input_dir] +
+                       [f"--{key}={value}" for key, value in sizes.items()], capture_output=True, check=True)
+        print(f"{args.messages} messages per chat, {args.sections} lorebook sections, JSON backend "
+              f"{sox_json.backend()}{', streamed chats' if args.stream else ''}, best of {args.repeat}:")
+        for name in args.only or CASES:
+            results[name] = measure(name, os.path.join(input_dir, CASES[name]), args.repeat, args.stream)
+    print_results(results)
+
+    if args.save:
+        report = {"date": time.strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(),
+                  "platform": platform.platform(), "json_backend": sox_json.backend(), "sizes": sizes,
+                  "stream": args.stream, "repeat": args.repeat, "results": results}
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.save}")
+    if baseline is not None and compare(results, baseline, args.tolerance):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+"""Cold start time of the SOXHub window.
+
+    python benchmarks/bench_hub_startup.py [--runs N] [--onscreen]
+
+Each run is a fresh interpreter that imports the hub, builds SOXHub and
+processes the first events (the window is shown offscreen unless
+--onscreen is given). It then opens every tool page once, which is what
+startup used to cost when all tool pages were built up front. The median of
+all runs is reported. Needs PyQt5.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HUB_SCRIPT = os.path.join(REPO_DIR, "SOX Project HUB5.py")
+
+# Runs in the child interpreter; prints one JSON line of timings (seconds)
+CHILD = r"""
+import importlib.util, json, sys, time
+start = time.perf_counter()
+from PyQt5.QtWidgets import QApplication
+app = QApplication(sys.argv)
+qt_ready = time.perf_counter()
+spec = importlib.util.spec_from_file_location("sox_hub", sys.argv[1])
+hub_module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(hub_module)
+imported = time.perf_counter()
+hub = hub_module.SOXHub()
+hub.show()
+app.processEvents()
+shown = time.perf_counter()
+for key in hub.tool_pages:
+    hub._open_tool(key)
+app.processEvents()
+all_pages = time.perf_counter()
+print(json.dumps({"qt": qt_ready - start, "import": imported - qt_ready,
+                  "window": shown - imported, "startup": shown - start, "all_pages": all_pages - shown}))
+"""
+
+
+def run_once(onscreen):
+    env = dict(os.environ)
+    if not onscreen: env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    output = subprocess.run([sys.executable, "-c", CHILD, HUB_SCRIPT], cwd=REPO_DIR, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--onscreen", action="store_true", help="use the real display instead of offscreen")
+    args = parser.parse_args(argv)
+
+    runs = [run_once(args.onscreen) for _ in range(args.runs)]
+    print(f"SOXHub startup, median of {args.runs} fresh processes:")
+    for name, label in [("qt", "PyQt5 import + QApplication"), ("import", "hub module import"),
+                        ("window", "SOXHub built and shown"), ("startup", "total to first window"),
+                        ("all_pages", "building all tool pages")]:
+        print(f"  {label:<30} {statistics.median(run[name] for run in runs) * 1000:8.1f} ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""JSON load/dump speed of the sox_json backends (stdlib json vs orjson) on synthetic exports.
+
+    python benchmarks/bench_json.py [--messages N] [--repeat R]
+
+The documents are a chat backup with N messages and a lorebook with N/10
+sections from synth_exports. Each backend loads the encoded bytes, and
+dumps pretty (indent=4, the card format) and compact (the JSONL record
+format). Both backends must give identical
+values and text, which is checked before anything is timed; orjson rows
+are skipped when it is not installed.
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sox_json # noqa: E402
+import synth_exports # noqa: E402
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=20000, help="messages in the synthetic chat")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (best is reported)")
+    args = parser.parse_args(argv)
+
+    documents = [("chat", synth_exports.make_chat(args.messages)),
+                 ("lorebook", synth_exports.make_lorebook(args.messages // 10))]
+    backends = [name for name in sox_json.BACKENDS if name == "json" or sox_json.orjson is not None]
+    if len(backends) < 2: print("orjson is not installed: timing the stdlib only.")
+    original = sox_json.backend()
+    try:
+        for label, document in documents:
+            encoded = {}
+            for name in backends:
+                sox_json.set_backend(name)
+                encoded[name] = (sox_json.dumps(document, 4), sox_json.dumps(document))
+                if sox_json.loads(encoded[name][0].encode('utf-8')) != document:
+                    print(f"MISMATCH: {name} does not load back what it dumped ({label})")
+                    return 1
+            if len(set(encoded.values())) > 1:
+                print(f"MISMATCH: the backends write different text ({label})")
+                return 1
+
+            pretty, compact = encoded["json"]
+            raw = pretty.encode('utf-8')
+            print(f"{label}: {len(raw) / 1e6:.1f} MB pretty, {len(compact.encode('utf-8')) / 1e6:.1f} MB compact,"
+                  f" best of {args.repeat}:")
+            for operation, func in (("load", lambda: sox_json.loads(raw)),
+                                    ("dump pretty", lambda: sox_json.dumps(document, 4)),
+                                    ("dump compact", lambda: sox_json.dumps(document))):
+                baseline = None
+                for name in backends:
+                    sox_json.set_backend(name)
+                    seconds = min(timeit.repeat(func, number=1, repeat=args.repeat))
+                    baseline = baseline or seconds
+                    print(f"  {operation:<13} {name:<7} {len(raw) / seconds / 1e6:8.1f} MB/s"
+                          f"  ({baseline / seconds:.1f}x)")
+    finally:
+        sox_json.set_backend(original)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Throughput of chat timestamp formatting: memoized fast path vs the general parser.
+
+    python benchmarks/bench_timestamps.py [--count N] [--repeat R]
+
+Timestamps are generated like a real chat (a few seconds to minutes apart,
+mixed Z / +00:00 / fractional-second shapes). Both implementations must give
+identical output, which is checked before anything is timed.
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sox_timestamps # noqa: E402
+
+
+def make_chat_timestamps(count, seed=1):
+    rng = random.Random(seed)
+    current = datetime(2024, 5, 1, 9, 30)
+    stamps = []
+    for _ in range(count):
+        current += timedelta(seconds=rng.randint(2, 240), microseconds=rng.randint(0, 999999))
+        shape = rng.random()
+        if shape < 0.5: stamps.append(current.isoformat(timespec='microseconds') + '+00:00')
+        elif shape < 0.8: stamps.append(current.isoformat(timespec='seconds') + 'Z')
+        else: stamps.append(current.isoformat(timespec='milliseconds') + 'Z')
+    return stamps
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=100000, help="timestamps per run")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per implementation (best is reported)")
+    args = parser.parse_args(argv)
+
+    stamps = make_chat_timestamps(args.count)
+    slow, fast = sox_timestamps.format_timestamp_slow, sox_timestamps.format_timestamp
+    if [slow(s) for s in stamps] != [fast(s) for s in stamps]:
+        print("MISMATCH: fast path output differs from the general parser")
+        return 1
+
+    def run(func, cold=False):
+        def body():
+            if cold: sox_timestamps.clear_memo()
+            for s in stamps: func(s)
+        return min(timeit.repeat(body, number=1, repeat=args.repeat))
+
+    results = [("general parser", run(slow)),
+               ("fast path, cold memo", run(fast, cold=True)),
+               ("fast path, warm memo", run(fast))]
+    baseline = results[0][1]
+    print(f"{args.count} timestamps, best of {args.repeat}:")
+    for name, seconds in results:
+        print(f"  {name:<22} {args.count / seconds:>12,.0f} /s  ({baseline / seconds:.1f}x)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""Seeded generator of synthetic XoulAI exports, for benchmarks and manual testing.
+
+    python benchmarks/synth_exports.py OUTPUT_DIR [--seed S] [--messages N] [--sections N] [--xouls N]
+
+Every shape the converters accept is covered: xoul cards, personas,
+scenarios, lorebooks (embedded.sections), single and group chat backups
+(conversation.personas/xouls/scenario + messages) and TavernAI persona
+backups. Text is multi-paragraph with *actions*, non-ASCII and emoji, and
+timestamps come in the Z / +00:00 / fractional-second shapes Xoul writes.
+The same seed always gives the same documents, so timings and output sizes
+of different runs (and commits) are comparable.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+WORDS = ("the", "tavern", "lantern", "quietly", "smiles", "road", "rain", "she", "he", "looks", "at", "you",
+         "and", "a", "of", "door", "sword", "whispers", "old", "map", "north", "night", "fire", "slowly",
+         "café", "naïve", "über", "señor", "日本", "みんな", "😊", "✨", "—", "«hello»")
+NAMES = ("Bob", "Aria", "Kael", "Mira", "Jun", "Zoë", "Ravi", "Élodie", "Tomasz", "Hana", "Ode", "Lux")
+TAGS = ("fantasy", "romance", "adventure", "sci-fi", "mystery", "slice of life", "horror", "comedy")
+ICON_HOST = "https://cdn.xoul.example/avatars"
+
+
+def _words(rng, count):
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def _paragraphs(rng, low, high, count=3):
+    parts = []
+    for _ in range(rng.randint(1, count)):
+        text = _words(rng, rng.randint(low, high))
+        parts.append(f"*{text}*" if rng.random() < 0.3 else text.capitalize() + ".")
+    return "\n\n".join(parts)
+
+
+def _slug(name, number):
+    return f"{name.lower()}-{number:05d}"
+
+
+def _timestamps(rng, count, start=datetime(2024, 5, 1, 9, 30)):
+    current = start
+    for _ in range(count):
+        current += timedelta(seconds=rng.randint(2, 240), microseconds=rng.randint(0, 999999))
+        shape = rng.random()
+        if shape < 0.5: yield current.isoformat(timespec='microseconds') + '+00:00'
+        elif shape < 0.8: yield current.isoformat(timespec='seconds') + 'Z'
+        else: yield current.isoformat(timespec='milliseconds') + 'Z'
+
+
+def _character(rng, number):
+    name = rng.choice(NAMES)
+    return {
+        "name": name, "slug": _slug(name, number),
+        "icon_url": f"{ICON_HOST}/{_slug(name, number)}.png",
+        "bio": _paragraphs(rng, 10, 40, 1), "backstory": _paragraphs(rng, 40, 200),
+        "definition": _paragraphs(rng, 20, 80), "greeting": _paragraphs(rng, 20, 80, 2),
+        "samples": _paragraphs(rng, 30, 120), "default_scenario": _paragraphs(rng, 20, 60, 1),
+        "social_tags": rng.sample(TAGS, 3), "talkativeness": rng.choice((0.3, 0.5, 0.8)),
+    }
+
+
+def _persona(rng, number):
+    name = rng.choice(NAMES)
+    return {"name": name, "icon_url": f"{ICON_HOST}/p-{number:05d}.webp", "prompt": _paragraphs(rng, 20, 80, 2)}
+
+
+def make_character(seed=1):
+    """A Xoul character (xoul card) export."""
+    return _character(random.Random(seed), 1)
+
+
+def make_persona(seed=1):
+    """A Xoul persona export."""
+    return _persona(random.Random(seed), 1)
+
+
+def make_scenario(seed=1):
+    """A Xoul scenario export."""
+    rng = random.Random(seed)
+    return {"name": "Rainy night at the " + rng.choice(("inn", "docks", "keep")), "prompt": _paragraphs(rng, 40, 120),
+            "prompt_spec": {"familiarity": rng.choice(("strangers", "old friends", "rivals")),
+                            "location": rng.choice(("a tavern", "the northern road", "a ship"))}}
+
+
+def make_lorebook(sections=200, seed=1):
+    """A Xoul lorebook export with `sections` entries."""
+    rng = random.Random(seed)
+    return {"name": "Synthetic lorebook", "slug": "synthetic-lorebook", "embedded": {"sections": [
+        {"name": f"{rng.choice(NAMES)} #{i}", "keywords": rng.sample(WORDS, 3), "text": _paragraphs(rng, 20, 120)}
+        for i in range(sections)]}}
+
+
+def make_chat(messages=1000, xouls=1, seed=1):
+    """A chat backup with `messages` messages; with more than one xoul, a group chat."""
+    rng = random.Random(seed)
+    characters = [_character(rng, i) for i in range(max(xouls, 1))]
+    personas = [_persona(rng, i) for i in range(1 if xouls <= 1 else 2)]
+    scenario = {"name": "Rainy night", "prompt": [
+        _paragraphs(rng, 40, 120) + f"\nfamiliarity: strangers\nlocation: {rng.choice(('a tavern', 'a ship'))}"]}
+    group = xouls > 1
+    stamps = _timestamps(rng, messages)
+    chat = []
+    for i, stamp in enumerate(stamps):
+        from_user = i % 2 == 1
+        content = _paragraphs(rng, 5, 60)
+        if group:
+            author = rng.choice(personas if from_user else characters)["name"]
+            chat.append({"message_id": f"m{i:07d}", "author_name": author,
+                         "author_type": "user" if from_user else "llm", "content": content, "timestamp": stamp})
+        else:
+            chat.append({"role": "user" if from_user else "assistant", "content": content, "timestamp": stamp})
+    name = "Synthetic group chat" if group else f"Chat with {characters[0]['name']}"
+    return {"conversation": {"name": name, "personas": personas, "xouls": characters, "scenario": scenario},
+            "messages": chat}
+
+
+def make_persona_backup(personas=20, seed=1):
+    """A TavernAI persona backup (the other input of the Add Persona tool)."""
+    rng = random.Random(seed)
+    backup = {"personas": {}, "persona_descriptions": {}, "default_persona": None}
+    for i in range(personas):
+        key = f"user-{i}.png"
+        backup["personas"][key] = rng.choice(NAMES)
+        backup["persona_descriptions"][key] = {"description": _paragraphs(rng, 10, 60, 1), "position": 0}
+    return backup
+
+
+def make_exports(messages=1000, sections=200, xouls=3, seed=1):
+    """{file name: document} for one of every export shape."""
+    return {
+        "character.json": make_character(seed),
+        "persona.json": make_persona(seed),
+        "scenario.json": make_scenario(seed),
+        "lorebook.json": make_lorebook(sections, seed),
+        "single_chat.json": make_chat(messages, 1, seed),
+        "group_chat.json": make_chat(messages, xouls, seed),
+        "persona_backup.json": make_persona_backup(seed=seed),
+    }
+
+
+def write_exports(directory, **sizes):
+    """Writes make_exports(**sizes) into `directory` the way Xoul does (compact UTF-8). Returns the paths."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, document in make_exports(**sizes).items():
+        path = os.path.join(directory, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(document, f, ensure_ascii=False, separators=(',', ':'))
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output", help="directory to write the exports to")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--messages", type=int, default=1000, help="messages per chat backup")
+    parser.add_argument("--sections", type=int, default=200, help="lorebook sections")
+    parser.add_argument("--xouls", type=int, default=3, help="xouls in the group chat")
+    args = parser.parse_args(argv)
+    for path in write_exports(args.output, messages=args.messages, sections=args.sections, xouls=args.xouls,
+                              seed=args.seed):
+        print(f"{path}: {os.path.getsize(path):,} bytes")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""Reading XoulAI exports straight out of .zip and .tar(.gz/.bz2/.xz) archives.
+
+Users get their data as archives, and unpacking them first writes every file
+to disk once more before it is even read. Here an archive member is named by
+an ArchiveMember, a str like any other filename, and read through
+open_text(), which streams it out of the archive:
+
+    for member in iter_members("xoul_export.zip"):
+        data = sox_engine.load_json(member)    # decompressed on the fly
+
+Archives stay open per process, so reading many members of one archive
+only reads its directory once. Members of a compressed tar are cheapest to
+read in archive order (the order iter_members yields them). Nothing here is
+safe to share between threads or processes: a forked worker must call
+reset() before reading, so it opens its own handles instead of moving the
+file offset under its parent's and siblings' feet.
+"""
+import io
+import os
+import tarfile
+import zipfile
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+# Errors that mean "not a readable archive"
+ARCHIVE_ERRORS = (OSError, zipfile.BadZipFile, tarfile.TarError, EOFError)
+
+_handles = {} # archive path -> open ZipFile / TarFile
+
+
+class ArchiveMember(str):
+    """A file inside an archive, usable wherever the engine takes a filename.
+
+    Its string value is the archive path joined with the member name (used
+    in messages and for naming outputs); the file itself is only reachable
+    through open_text().
+    """
+    def __new__(cls, archive, name, size=None):
+        self = super().__new__(cls, os.path.join(archive, *name.split('/')))
+        self.archive = archive
+        self.name = name
+        self.size = size
+        return self
+
+    def __reduce__(self): # Picklable for the batch CLI's worker processes
+        return (ArchiveMember, (self.archive, self.name, self.size))
+
+
+def is_archive(path):
+    """True for a plain path (not a member) with an archive file extension."""
+    return isinstance(path, str) and not isinstance(path, ArchiveMember) and path.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def archive_stem(path):
+    """Archive file name without its archive extension ("export.tar.gz" -> "export")."""
+    name = os.path.basename(path)
+    for suffix in sorted(ARCHIVE_SUFFIXES, key=len, reverse=True):
+        if name.lower().endswith(suffix): return name[:-len(suffix)]
+    return name
+
+
+def _open_archive(path):
+    handle = _handles.get(path)
+    if handle is None:
+        handle = zipfile.ZipFile(path) if path.lower().endswith('.zip') else tarfile.open(path, 'r:*')
+        _handles[path] = handle
+    return handle
+
+
+def iter_members(path, suffix='.json'):
+    """Yields an ArchiveMember for each file in the archive whose name ends with `suffix`, in archive order.
+
+    Only the archive's directory/headers are read; no member is extracted.
+    Raises one of ARCHIVE_ERRORS if the archive cannot be read.
+    """
+    archive = _open_archive(path)
+    if isinstance(archive, zipfile.ZipFile):
+        for info in archive.infolist():
+            if not info.is_dir() and info.filename.lower().endswith(suffix):
+                yield ArchiveMember(path, info.filename, info.file_size)
+    else:
+        for info in archive: # Headers are read as the iteration goes
+            if info.isfile() and info.name.lower().endswith(suffix):
+                yield ArchiveMember(path, info.name, info.size)
+
+
+def open_binary(source):
+    """Opens a filename or an ArchiveMember for reading as bytes."""
+    if not isinstance(source, ArchiveMember):
+        return open(source, 'rb')
+    try:
+        archive = _open_archive(source.archive)
+        return archive.open(source.name) if isinstance(archive, zipfile.ZipFile) else archive.extractfile(source.name)
+    except KeyError:
+        raise FileNotFoundError(f"No member '{source.name}' in {source.archive}")
+
+
+def open_text(source):
+    """Opens a filename or an ArchiveMember for reading as UTF-8 text."""
+    if not isinstance(source, ArchiveMember):
+        return open(source, 'r', encoding='utf-8')
+    return io.TextIOWrapper(open_binary(source), encoding='utf-8')
+
+
+def file_size(source):
+    """Uncompressed size in bytes of a filename or an ArchiveMember."""
+    if not isinstance(source, ArchiveMember):
+        return os.path.getsize(source)
+    if source.size is None:
+        archive = _open_archive(source.archive)
+        try:
+            info = archive.getinfo(source.name) if isinstance(archive, zipfile.ZipFile) else archive.getmember(source.name)
+        except KeyError:
+            raise FileNotFoundError(f"No member '{source.name}' in {source.archive}")
+        source.size = info.file_size if isinstance(archive, zipfile.ZipFile) else info.size
+    return source.size
+
+
+def reset():
+    """Forgets the archives opened so far, without closing them (for a forked worker process).
+
+    A forked process shares its parent's open files, offsets included, so
+    closing or reading through an inherited handle would disturb the parent.
+    """
+    _handles.clear()
+
+
+def close_all():
+    """Closes every archive opened so far in this process."""
+    for handle in _handles.values():
+        handle.close()
+    _handles.clear()
@@ -0,0 +1,40 @@
+"""Process-wide cache of the UI images (SOX.png, SOXico.png, Credits.png).
+
+The hub shows the SOX header on the menu and on every tool page. Loading it
+per page decodes the PNG again each time and keeps one full copy of the
+pixels per page. Here each file is decoded once and every caller gets the
+same implicitly shared QPixmap, so all labels point at a single copy of the
+pixel data.
+
+Needs a QApplication to exist before the first call.
+"""
+from PyQt5.QtGui import QIcon, QPixmap
+
+_pixmaps = {} # path -> QPixmap
+_icons = {} # path -> QIcon
+
+
+def pixmap(path):
+    """Shared QPixmap for an image file.
+
+    A file that cannot be loaded gives a null pixmap (check isNull()), the
+    same as QPixmap(path) would.
+    """
+    cached = _pixmaps.get(path)
+    if cached is None:
+        cached = _pixmaps[path] = QPixmap(path)
+    return cached
+
+
+def icon(path):
+    """Shared QIcon for an image file (e.g. a window icon)."""
+    cached = _icons.get(path)
+    if cached is None:
+        cached = _icons[path] = QIcon(pixmap(path))
+    return cached
+
+
+def clear():
+    """Drops every cached image (they are freed once no widget shows them any more)."""
+    _pixmaps.clear()
+    _icons.clear()
@@ -0,0 +1,157 @@
+"""Persistent, content-addressed cache for downloaded avatars.
+
+Many accounts share the same popular xouls, so the same icon URLs show up
+again and again across migrations. The cache keeps one copy of every image,
+named by the SHA-256 of its bytes, plus an index of which URL produced which
+blob:
+
+    <cache dir>/index.json                 url -> {"sha256", "size", "last_used"}
+    <cache dir>/blobs/ab/abcdef....        image bytes
+
+Output folders get a hardlink to the blob (a copy when linking is not
+possible), so a re-run or another account costs neither network traffic nor
+extra disk space. When the blobs outgrow `max_bytes` the least recently used
+ones are evicted.
+"""
+import hashlib
+import os
+import shutil
+import threading
+import time
+
+import sox_json
+import sox_log
+from sox_output import atomic_open
+
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024 # 1 GB
+
+
+def default_cache_dir():
+    """SOX_CACHE_DIR if set, else the per-user cache folder of the platform."""
+    if os.environ.get("SOX_CACHE_DIR"):
+        return os.environ["SOX_CACHE_DIR"]
+    if os.name == 'nt':
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "SOX Project", "avatar_cache")
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "sox_project", "avatars")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_or_copy(source, destination):
+    """Hardlinks source to destination, falling back to a copy (other drive, FAT, ...)."""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+class AvatarCache:
+    """URL -> blob index over a content-addressed blob store. Safe to share between download threads.
+
+    Note that outputs are hardlinks: editing a downloaded avatar in place
+    also edits the cached copy. Blobs whose size no longer matches the index
+    are treated as missing.
+    """
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self._index_path = os.path.join(self.directory, "index.json")
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.hits = 0
+        os.makedirs(os.path.join(self.directory, "blobs"), exist_ok=True)
+        self._index = self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self._index_path, 'rb') as f:
+                index = sox_json.load(f)
+            return index if isinstance(index, dict) else {}
+        except (OSError, ValueError):
+            return {} # Missing or corrupt index: start over, blobs are re-indexed as URLs come back
+
+    def blob_path(self, sha256):
+        return os.path.join(self.directory, "blobs", sha256[:2], sha256)
+
+    def lookup(self, url):
+        """Returns (blob_path, sha256) for a cached URL, or None."""
+        with self._lock:
+            entry = self._index.get(url)
+            if not entry: return None
+            path = self.blob_path(entry["sha256"])
+            try:
+                if os.path.getsize(path) != entry["size"]:
+                    raise OSError("size mismatch")
+            except OSError:
+                del self._index[url]
+                self._dirty = True
+                return None
+            entry["last_used"] = time.time()
+            self._dirty = True
+            self.hits += 1
+            return path, entry["sha256"]
+
+    def store(self, url, path):
+        """Adds a freshly downloaded file to the cache (hardlinked, or copied) and indexes it by URL."""
+        sha256 = file_sha256(path)
+        blob = self.blob_path(sha256)
+        if not os.path.exists(blob):
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            temp_blob = f"{blob}.{os.getpid()}.{threading.get_ident()}.tmp" # Processes may share the cache
+            link_or_copy(path, temp_blob)
+            os.replace(temp_blob, blob)
+        with self._lock:
+            self._index[url] = {"sha256": sha256, "size": os.path.getsize(blob), "last_used": time.time()}
+            self._dirty = True
+        return blob
+
+    def evict(self):
+        """Deletes least recently used blobs until the store fits in max_bytes. Returns bytes freed."""
+        with self._lock:
+            blobs = {} # sha256 -> [size, last_used]
+            for entry in self._index.values():
+                info = blobs.setdefault(entry["sha256"], [entry["size"], 0])
+                info[1] = max(info[1], entry.get("last_used", 0))
+            total = sum(size for size, _ in blobs.values())
+            freed = 0
+            for sha256, (size, _) in sorted(blobs.items(), key=lambda item: item[1][1]):
+                if total - freed <= self.max_bytes: break
+                try:
+                    os.remove(self.blob_path(sha256))
+                except OSError:
+                    pass
+                freed += size
+                for url in [u for u, e in self._index.items() if e["sha256"] == sha256]:
+                    del self._index[url]
+                self._dirty = True
+            return freed
+
+    def save(self):
+        """Evicts if over budget and writes the index (atomically)."""
+        self.evict()
+        with self._lock:
+            if not self._dirty: return
+            # A temporary file of its own per process and thread, synced per the sox_output policy
+            with atomic_open(self._index_path) as f:
+                sox_json.dump(self._index, f)
+            self._dirty = False
+
+
+def open_cache(directory=None, max_bytes=DEFAULT_MAX_BYTES):
+    """AvatarCache for the given (or default) folder, or None if it cannot be created.
+
+    Downloads then simply run uncached.
+    """
+    try:
+        return AvatarCache(directory, max_bytes)
+    except OSError as e:
+        sox_log.warning(f"Avatar cache unavailable ({e}); downloading without it.", "avatar_cache")
+        return None
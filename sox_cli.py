@@ -0,0 +1,624 @@
+"""S.O.X. Project batch converter (command line, no GUI needed).
+
+Converts whole directories of XoulAI exports into TavernAI files in one run.
+The converter for each JSON is picked from its shape, the same way the
+SOXHub tools decide whether to enable their Export button.
+
+Usage:
+    python sox_cli.py INPUT [INPUT ...] -o OUTPUT_DIR [--extract] [--avatars] [--stream] [--compact] [-j JOBS]
+    python sox_cli.py INPUT [INPUT ...] -o BUNDLE.zip [...]
+
+INPUT can be a .json file, a directory (searched recursively), a glob
+pattern such as "exports/**/*.json" or a .zip/.tar.gz archive, which is read
+in place without unpacking it. Outputs keep the input's folder layout under
+OUTPUT_DIR (an archive counts as a folder named after it). Files are converted in parallel worker processes (one per
+CPU core by default); output names are still given out in input order, so
+the result is the same as a serial run (-j 1).
+
+With --extract each chat backup is migrated in one pass (chat, xoul cards
+and scenario); --avatars also downloads the images the backups reference
+into an "avatars" folder next to their outputs. --compact writes cards and
+lorebooks as one-line JSON instead of indenting them (smaller and faster;
+the content is the same).
+
+When OUTPUT ends with .zip, .tar, .tar.gz, .tar.bz2 or .tar.xz, everything
+goes into that one archive instead, laid out like a SillyTavern data
+directory (characters/, worlds/, chats/<character>/, group chats/ and
+avatars/). The archive only appears once the whole batch is done.
+
+A run into a directory records what it converted in .sox_manifest.json
+there (see sox_manifest); the next run skips inputs whose content, options
+and converter versions are unchanged. --force converts everything again.
+
+--report FILE writes a JSON run report (time per stage, counters and
+rates, see sox_metrics); --profile and --trace-memory add the top
+functions from cProfile and allocation sites from tracemalloc (of this
+process: use -j 1 to profile the conversions themselves). --trace FILE
+writes a Chrome/Perfetto trace with every input, converter, stage and
+avatar download as a slice on the track of the worker that ran it.
+
+Problems found in an input (skipped messages, unparsable timestamps...)
+are summed up after it, e.g. "2,314 timestamp parse failures, first 5
+shown" (see sox_log); -v/--verbose lists every one as it happens.
+--log-level hides messages below a level and --log-file FILE also writes
+everything, as JSON Lines, to FILE.
+"""
+import argparse
+import glob
+import itertools
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+
+import sox_archive
+import sox_cache
+import sox_dedup
+import sox_engine
+import sox_log
+import sox_manifest
+import sox_metrics
+import sox_output
+from sox_engine import ConversionError
+from sox_names import NameAllocator
+
+
+# --- Input discovery ---
+def iter_input_files(inputs):
+    """Yields (path, relative_dir) for every JSON file named by the inputs.
+
+    relative_dir is where the file's outputs go below the output directory.
+    Archives (.zip, .tar.gz, ...) are opened in place and their JSON members
+    yielded as sox_archive.ArchiveMember paths, outputs going to a folder
+    named after the archive (see _archive_folder).
+    """
+    seen = set()
+    folders = set() # normcased archive output folders handed out
+    named = _stem_clashes([spec for spec in inputs if not os.path.isdir(spec) and not glob.has_magic(spec)])
+    for spec in inputs:
+        if os.path.isdir(spec):
+            for root, dirs, files in os.walk(spec):
+                dirs.sort()
+                rel_dir = os.path.relpath(root, spec)
+                rel_dir = '' if rel_dir == '.' else rel_dir
+                clashes = _stem_clashes([os.path.join(root, name) for name in files], dirs)
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    if sox_archive.is_archive(path):
+                        folder = _archive_folder(path, rel_dir, clashes, folders)
+                        yield from _unseen(_archive_members(path, rel_dir, folder), seen)
+                    elif name.lower().endswith('.json'):
+                        yield from _unseen([(path, rel_dir)], seen)
+        elif glob.has_magic(spec):
+            matches = sorted(p for p in glob.glob(spec, recursive=True) if os.path.isfile(p))
+            clashes = _stem_clashes(matches)
+            for path in matches:
+                if sox_archive.is_archive(path):
+                    candidates = _archive_members(path, '', _archive_folder(path, '', clashes, folders))
+                else:
+                    candidates = [(path, '')]
+                yield from _unseen(candidates, seen)
+        elif sox_archive.is_archive(spec):
+            yield from _unseen(_archive_members(spec, '', _archive_folder(spec, '', named, folders)), seen)
+        else:
+            yield from _unseen([(spec, '')], seen)
+
+
+def _stem_clashes(paths, dirs=()):
+    """Archive stems among `paths` that another archive there, or a folder in `dirs`, also has."""
+    stems = [os.path.normcase(sox_archive.archive_stem(path)) for path in paths if sox_archive.is_archive(path)]
+    return {stem for stem in stems if stems.count(stem) > 1} | \
+        (set(stems) & {os.path.normcase(name) for name in dirs})
+
+
+def _archive_folder(path, rel_dir, clashes, folders):
+    """Output folder (relative) for an archive's members, named after it ("export.zip" -> "export").
+
+    The archive extension is kept ("export_zip", "export_tar_gz") when the
+    stem is in `clashes` or its folder was already handed out (`folders`),
+    so two archives' outputs never end up mixed in one folder.
+    """
+    stem = sox_archive.archive_stem(path)
+    folder = os.path.join(rel_dir, stem)
+    if os.path.normcase(stem) in clashes or os.path.normcase(folder) in folders:
+        folder += os.path.basename(path)[len(stem):].replace('.', '_')
+    folders.add(os.path.normcase(folder))
+    return folder
+
+
+def _archive_members(path, rel_dir, archive_dir):
+    """(member, relative_dir) for the JSON members of an archive; the archive itself if it cannot be read."""
+    try:
+        for member in sox_archive.iter_members(path):
+            yield member, os.path.join(archive_dir, *member.name.split('/')[:-1])
+    except sox_archive.ARCHIVE_ERRORS as e:
+        sox_log.error(f"Could not read archive {path}: {e}", "archive", path=str(path))
+        yield path, rel_dir # Reported as a failed input by convert_file
+
+
+def _unseen(candidates, seen):
+    for path, rel_dir in candidates:
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            yield path, rel_dir
+
+
+# --- Conversion ---
+class FileSummary:
+    """What happened to one input file."""
+    def __init__(self, path, output_dir=None):
+        self.path = path
+        self.output_dir = output_dir
+        self.converters = []
+        self.written = []
+        self.failed_count = 0
+        self.errors = []
+        self.staged = [] # (temp_path, final_name, folder, card_key) written by a worker, see commit_staged()
+        self.reused = [] # character cards another input of the run already wrote (not written again)
+        self.cards = [] # (identity, card hash, path) of the xoul cards in written and reused, for the manifest
+        self.avatar_urls = set() # image URLs found by account_migration
+        self.fingerprint = None # content hash etc. for the manifest (incremental runs only)
+        self.skipped = False # up to date according to the manifest, nothing converted
+        self.ignored = None # why the input is left out on purpose (e.g. a persona); not an error
+        self.metrics = None # sox_metrics.take() of the worker process that converted it
+
+    @property
+    def ok(self):
+        return bool(self.written or self.reused) and not self.errors
+
+    @property
+    def failed(self):
+        return bool(self.errors) or not (self.ok or self.ignored)
+
+
+_stage_ids = itertools.count() # with the pid, keeps staged file names unique across worker processes
+
+
+def _bundle_name(output):
+    return f"{output.folder}/{output.name}" if output.folder else output.name
+
+
+def convert_file(path, output_dir, extract=False, names=None, stream=False, staged=False, bundle=None,
+                 incremental=False, previous=None, characters=None, compact=False):
+    """Loads one input, runs every converter that applies and writes the outputs.
+
+    Chat messages are streamed from disk when `stream` is set or the file is
+    above sox_engine.STREAMING_THRESHOLD_BYTES.
+
+    With `staged` (used in worker processes) outputs go to temporary files
+    listed in summary.staged; commit_staged() then gives them their final
+    names in the parent. Otherwise, given a sox_output.BundleWriter, the
+    outputs are added to it (under their OutputFile.folder) and
+    `output_dir` is not used.
+
+    With `incremental` the input is fingerprinted first; if `previous` (its
+    manifest entry) shows it is up to date, the summary just reports the
+    recorded outputs with `skipped` set.
+
+    Given a sox_dedup.CharacterIndex, xoul cards it already holds are not
+    written again (they are listed in summary.reused) and new variants of a
+    xoul get a hash suffix. Staged outputs carry their card key instead, for
+    commit_staged() to check.
+
+    JSON outputs are indented by 4 spaces, or written on one line with `compact`.
+    """
+    indent = None if compact else 4
+    if names is None: names = NameAllocator(snapshot=False)
+    summary = FileSummary(path, output_dir)
+    if sox_archive.is_archive(path):
+        summary.errors.append("Could not read the archive (damaged or not a supported format).")
+        return summary
+    if incremental:
+        try:
+            summary.fingerprint = sox_manifest.fingerprint(path, previous)
+        except sox_archive.ARCHIVE_ERRORS:
+            pass # Reported by load_json below
+        if sox_manifest.is_current(previous, summary.fingerprint, extract, compact):
+            summary.skipped = True
+            summary.converters = list(previous["converters"])
+            summary.written = list(previous["outputs"])
+            summary.reused = list(previous.get("reused", []))
+            summary.avatar_urls = set(previous.get("avatar_urls", []))
+            return summary
+    try:
+        stream_key = "messages" if stream or sox_engine.should_stream(path) else None
+        data = sox_engine.load_json(path, stream_key)
+    except ConversionError as e:
+        summary.errors.append(str(e).replace('\n', ' '))
+        return summary
+
+    summary.converters = sox_engine.detect_converters(data, extract=extract)
+    if not summary.converters:
+        summary.ignored = sox_engine.skip_reason(data)
+        if not summary.ignored: summary.errors.append("Not a recognized XoulAI export (no converter applies).")
+        return summary
+
+    if bundle is None or staged: os.makedirs(output_dir, exist_ok=True)
+    for name in summary.converters:
+        with sox_metrics.span(name, "converter"): # Chat messages are converted while being written below
+            try:
+                result = sox_engine.BATCH_CONVERTERS[name](data, path)
+            except ConversionError as e:
+                summary.errors.append(f"{name}: {e}")
+                continue
+            except Exception as e:
+                summary.errors.append(f"{name}: unexpected error: {e}")
+                continue
+
+            for output in result.outputs:
+                card_key = sox_dedup.card_key(output)
+                if card_key and characters is not None and not staged:
+                    existing = characters.find(*card_key)
+                    if existing is not None:
+                        summary.reused.append(existing if bundle is None else os.path.join(bundle.path, existing))
+                        summary.cards.append((*card_key, summary.reused[-1]))
+                        continue
+                if bundle is not None and not staged:
+                    try:
+                        member = _bundle_name(output)
+                        if card_key and characters is not None: member = characters.name_for(*card_key, member)
+                        member = bundle.add(member, output.data, is_jsonl=output.is_jsonl, indent=indent)
+                        if card_key and characters is not None: characters.add(*card_key, member)
+                        summary.written.append(os.path.join(bundle.path, member))
+                    except ConversionError as e:
+                        summary.errors.append(f"{name}: {e}".replace('\n', ' '))
+                    except Exception as e:
+                        summary.errors.append(f"{name}: could not add {output.name} to {bundle.path}: {e}")
+                    continue
+                if staged:
+                    output_path = os.path.join(output_dir, f".{output.name}.{os.getpid()}.{next(_stage_ids)}.part")
+                elif card_key and characters is not None:
+                    wanted = characters.name_for(*card_key, os.path.join(output_dir, output.name))
+                    output_path = names.allocate(output_dir, os.path.basename(wanted))
+                else:
+                    output_path = names.allocate(output_dir, output.name)
+                try:
+                    sox_engine.save_json(output.data, output_path, indent, is_jsonl=output.is_jsonl)
+                    if staged: summary.staged.append((output_path, output.name, output.folder, card_key))
+                    else: summary.written.append(output_path)
+                    if card_key and characters is not None and not staged:
+                        characters.add(*card_key, output_path)
+                        summary.cards.append((*card_key, output_path))
+                except ConversionError as e:
+                    summary.errors.append(f"{name}: {e}".replace('\n', ' '))
+        # Chat outputs are converted while being written, so the counts are final only now
+        summary.failed_count += result.failed_count
+        summary.errors.extend(f"{name}: {msg}" for msg in result.errors)
+        summary.avatar_urls.update(result.avatar_urls)
+    return summary
+
+
+def commit_staged(summary, names, bundle=None, characters=None):
+    """Moves a worker's staged outputs to their final names (allocated here, so in input order).
+
+    With a bundle they are added to it instead, and the staged files
+    deleted. Xoul cards `characters` already holds are dropped.
+    """
+    for temp_path, name, folder, card_key in summary.staged:
+        if card_key is None or characters is None:
+            card_key = None
+        else:
+            existing = characters.find(*card_key)
+            if existing is not None:
+                summary.reused.append(existing if bundle is None else os.path.join(bundle.path, existing))
+                summary.cards.append((*card_key, summary.reused[-1]))
+                _discard(temp_path)
+                continue
+        if bundle is not None:
+            try:
+                member = f"{folder}/{name}" if folder else name
+                if card_key: member = characters.name_for(*card_key, member)
+                member = bundle.add_file(member, temp_path)
+                if card_key: characters.add(*card_key, member)
+                summary.written.append(os.path.join(bundle.path, member))
+            except OSError as e:
+                summary.errors.append(f"Could not add {name} to {bundle.path}: {e}")
+            _discard(temp_path)
+            continue
+        directory = os.path.dirname(temp_path)
+        if card_key: name = os.path.basename(characters.name_for(*card_key, os.path.join(directory, name)))
+        output_path = names.allocate(directory, name)
+        try:
+            os.replace(temp_path, output_path)
+            sox_output.mark_written(output_path)
+            if card_key:
+                characters.add(*card_key, output_path)
+                summary.cards.append((*card_key, output_path))
+            summary.written.append(output_path)
+        except OSError as e:
+            summary.errors.append(f"Could not write {output_path}: {e}")
+            _discard(temp_path)
+    summary.staged = []
+
+
+def _init_worker(fsync_policy, metrics, trace, log_settings):
+    sox_output.set_fsync_policy(fsync_policy)
+    sox_archive.reset() # Archives the parent listed are its own: read them through new handles
+    sox_log.reset()
+    sox_log.configure(**log_settings)
+    if metrics:
+        sox_metrics.enable(trace=trace)
+        sox_metrics.set_process_name(f"worker {os.getpid()}")
+
+
+def _convert_in_worker(path, *args):
+    with sox_metrics.span("file", "file", path=str(path)):
+        summary = convert_file(path, *args)
+    sox_log.flush(str(path))
+    if sox_metrics.enabled(): summary.metrics = sox_metrics.take()
+    return summary
+
+
+def _discard(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+# --- Batch execution ---
+def _record(summary, manifest, extract, compact, names, characters, entry):
+    """Updates the manifest for one input and deletes outputs its previous conversion no longer produces.
+
+    The cards of a skipped input go into `characters`, so later inputs reuse them
+    (or name their variants apart) rather than writing over them.
+    """
+    if summary.skipped:
+        for path in summary.written: names.claim(path)
+        for identity, digest, path in entry.get("cards", []):
+            characters.add(identity, digest, path)
+            summary.cards.append((identity, digest, path))
+    stale = manifest.record(summary, extract, compact)
+    if summary.ok:
+        for path in stale:
+            if not names.is_taken(path): _discard(path)
+
+
+def _release(entry, names):
+    """Frees the names of an input's previous outputs before it is converted again.
+
+    Cards it reused belong to the inputs that wrote them and stay taken.
+    """
+    if entry:
+        for path in entry["outputs"]: names.release(path)
+
+
+def run_batch(files, output_root, extract=False, stream=False, jobs=None, bundle=None, manifest=None,
+              compact=False):
+    """Converts (path, relative_dir) pairs, yielding a FileSummary per input in input order.
+
+    jobs is the number of worker processes (None: one per CPU core); with
+    one job, or one file, everything runs in this process. With a
+    sox_output.BundleWriter the outputs go into it and output_root is
+    not used.
+
+    With a sox_manifest.Manifest inputs it lists as up to date are skipped
+    (their summaries have `skipped` set) and it is updated and saved as the
+    batch goes. The outputs of listed inputs keep their names: they are
+    reserved up front, and only given up once their input is converted again.
+
+    Each xoul card is written once per run (see sox_dedup); repeats from
+    later inputs are listed in their summaries' `reused`.
+    """
+    files = list(files)
+    jobs = min(jobs or os.cpu_count() or 1, len(files))
+    previous = [manifest.lookup(path) if manifest else None for path, _ in files]
+    names = NameAllocator(snapshot=False) # Re-runs replace their own earlier outputs
+    for entry in previous:
+        for path in (entry["outputs"] + entry["reused"] if entry else []): names.claim(path)
+    incremental = manifest is not None
+    characters = sox_dedup.CharacterIndex()
+    if jobs <= 1:
+        try:
+            for (path, rel_dir), entry in zip(files, previous):
+                _release(entry, names)
+                with sox_metrics.span("file", "file", path=str(path)):
+                    summary = convert_file(path, os.path.join(output_root, rel_dir), extract, names, stream,
+                                           bundle=bundle, incremental=incremental, previous=entry,
+                                           characters=characters, compact=compact)
+                sox_log.flush(str(path))
+                if manifest: _record(summary, manifest, extract, compact, names, characters, entry)
+                yield summary
+        finally:
+            if manifest: manifest.save()
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    stage_dir = None
+    if bundle is not None: # Workers write here; the outputs are moved into the bundle in input order
+        stage_dir = tempfile.mkdtemp(prefix=".sox-stage-", dir=os.path.dirname(os.path.abspath(bundle.path)))
+    # Workers only write staged files; under "batch" the parent syncs them once committed
+    worker_policy = "file" if sox_output.get_fsync_policy() == "file" else "never"
+    executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                   initargs=(worker_policy, sox_metrics.enabled(), sox_metrics.tracing(),
+                                             sox_log.settings()))
+    futures = [executor.submit(_convert_in_worker, path, stage_dir or os.path.join(output_root, rel_dir),
+                               extract, None, stream, True, None, incremental, entry, None, compact)
+               for (path, rel_dir), entry in zip(files, previous)]
+    committed = 0
+    try:
+        for (path, rel_dir), entry, future in zip(files, previous, futures):
+            try:
+                summary = future.result()
+            except Exception as e: # Worker died (out of memory, killed...)
+                summary = FileSummary(path, os.path.join(output_root, rel_dir))
+                summary.errors.append(f"Worker process failed: {e!r}")
+            sox_metrics.merge(summary.metrics)
+            _release(entry, names)
+            with sox_metrics.span("commit", path=str(path)):
+                commit_staged(summary, names, bundle, characters)
+            if manifest: _record(summary, manifest, extract, compact, names, characters, entry)
+            committed += 1
+            yield summary
+    finally:
+        if manifest: manifest.save()
+        # Interrupted: drop queued files and clean up outputs nobody will commit
+        executor.shutdown(wait=True, cancel_futures=True)
+        for future in futures[committed:]:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                for temp_path, *_ in future.result().staged:
+                    _discard(temp_path)
+        if stage_dir is not None:
+            shutil.rmtree(stage_dir, ignore_errors=True)
+
+
+def download_batch_avatars(summaries, bundle=None):
+    """Downloads the avatar URLs found in the converted files, into an avatars folder per output folder.
+
+    With a bundle they all go to its avatars/ folder.
+    """
+    if bundle is not None:
+        urls = set().union(*(s.avatar_urls for s in summaries))
+        if urls: _download_bundle_avatars(sorted(urls), bundle)
+        return
+    urls_by_dir = {}
+    for summary in summaries:
+        if summary.avatar_urls:
+            urls_by_dir.setdefault(os.path.join(summary.output_dir, "avatars"), set()).update(summary.avatar_urls)
+    if not urls_by_dir: return
+    cache = sox_cache.open_cache()
+    for directory, urls in urls_by_dir.items():
+        os.makedirs(directory, exist_ok=True)
+        download_count, failed_downloads = sox_engine.download_avatars(sorted(urls), directory, cache=cache)
+        print(f"Avatars: {download_count} of {len(urls)} saved to {directory}")
+        _log_failed_downloads(failed_downloads)
+
+
+def _download_bundle_avatars(urls, bundle):
+    with tempfile.TemporaryDirectory(prefix=".sox-avatars-", dir=os.path.dirname(os.path.abspath(bundle.path))) as directory:
+        download_count, failed_downloads = sox_engine.download_avatars(urls, directory, cache=sox_cache.open_cache())
+        for name in sorted(os.listdir(directory)):
+            bundle.add_file(f"avatars/{name}", os.path.join(directory, name))
+    print(f"Avatars: {download_count} of {len(urls)} added to {bundle.path}")
+    _log_failed_downloads(failed_downloads)
+
+
+def _log_failed_downloads(failed_downloads):
+    for url, reason in failed_downloads.items():
+        sox_log.repeated("avatars not downloaded", "%s: %s", url, reason)
+    sox_log.flush()
+
+
+def print_summary(summaries):
+    converted = sum(1 for s in summaries if s.ok)
+    written = sum(len(s.written) for s in summaries)
+    failed = [s for s in summaries if s.failed]
+    print("\n--- Batch Summary ---")
+    print(f"Input files: {len(summaries)}")
+    print(f"Converted without errors: {converted}")
+    skipped = [s for s in summaries if s.skipped]
+    if skipped:
+        written -= sum(len(s.written) for s in skipped)
+        print(f"Unchanged since the last run (skipped): {len(skipped)}")
+    ignored = [s for s in summaries if s.ignored]
+    if ignored:
+        print(f"Skipped, not converted in batch: {len(ignored)}")
+        for s in ignored: print(f"  {s.path}: {s.ignored}")
+    print(f"Output files written: {written}")
+    repeats = sum(len(s.reused) for s in summaries if not s.skipped)
+    if repeats: print(f"Repeated xoul cards not written again: {repeats}")
+    if failed:
+        print(f"Files with errors: {len(failed)}")
+        for s in failed:
+            for msg in s.errors or ["No output written."]:
+                print(f"  {s.path}: {msg}")
+    print("---------------------")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch convert XoulAI exports to TavernAI files.")
+    parser.add_argument("inputs", nargs="+", help="JSON files, directories or glob patterns")
+    parser.add_argument("-o", "--output", required=True,
+                        help="directory to write the converted files to, or a .zip/.tar.gz/.tar.xz bundle")
+    parser.add_argument("--extract", action="store_true",
+                        help="also extract characters and scenario from chat backups")
+    parser.add_argument("--avatars", action="store_true",
+                        help="also download the avatars referenced by chat backups (implies --extract)")
+    parser.add_argument("--stream", action="store_true",
+                        help="always stream chat messages from disk instead of loading whole files")
+    parser.add_argument("--compact", action="store_true",
+                        help="write cards and lorebooks as one-line JSON instead of indenting them")
+    parser.add_argument("-j", "--jobs", type=int, default=0,
+                        help="worker processes to convert files with (default: one per CPU core)")
+    parser.add_argument("--fsync", choices=sox_output.FSYNC_POLICIES, default="batch",
+                        help="when to force outputs to disk: after each file, once at the end (default) or never")
+    parser.add_argument("--force", action="store_true",
+                        help="convert every input again, even those unchanged since the last run")
+    parser.add_argument("--report", metavar="FILE",
+                        help="write a JSON run report (time per stage, counters) to FILE")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="write a Chrome/Perfetto trace of the run (open it in ui.perfetto.dev) to FILE")
+    parser.add_argument("--profile", action="store_true", help="add a cProfile summary to the run report")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="add tracemalloc's allocation sites to the run report")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="list every skipped message, timestamp error and download instead of summing them up")
+    parser.add_argument("--log-level", choices=sorted(sox_log.LEVELS, key=sox_log.LEVELS.get),
+                        help="hide messages below this level (default: info)")
+    parser.add_argument("--log-file", metavar="FILE", help="also write every message to FILE, as JSON Lines")
+    args = parser.parse_args(argv)
+    if (args.profile or args.trace_memory) and not args.report:
+        parser.error("--profile and --trace-memory need --report")
+    if args.report or args.trace:
+        sox_metrics.enable(profile=args.profile, memory=args.trace_memory, trace=bool(args.trace))
+    try:
+        sox_log.configure(level=args.log_level, verbose=args.verbose or None, file=args.log_file)
+    except OSError as e:
+        print(f"Could not open the log file {args.log_file}: {e}")
+        return 1
+    if args.avatars: args.extract = True
+    sox_output.set_fsync_policy(args.fsync)
+
+    bundle = None
+    if sox_output.bundle_suffix(args.output):
+        try:
+            bundle = sox_output.BundleWriter(args.output)
+        except OSError as e:
+            sox_log.error(f"Could not create {args.output}: {e}")
+            return 1
+    # Incremental runs need the previous outputs on disk, so bundles are always built in full
+    manifest = sox_manifest.Manifest(args.output, fresh=args.force) if bundle is None else None
+
+    summaries = []
+    try:
+        for summary in run_batch(iter_input_files(args.inputs), args.output, args.extract, args.stream, args.jobs,
+                                 bundle, manifest, args.compact):
+            status = "UP TO DATE" if summary.skipped else "OK" if summary.ok else "SKIPPED" if summary.ignored else "ERROR"
+            repeats = f", {len(summary.reused)} already written" if summary.reused else ""
+            if summary.ignored: print(f"[{status}] {summary.path} ({summary.ignored})")
+            else: print(f"[{status}] {summary.path} ({', '.join(summary.converters) or 'unknown'}) -> {len(summary.written)} file(s){repeats}")
+            summaries.append(summary)
+
+        if not summaries:
+            print("No input JSON files found.")
+            if bundle is not None: bundle.abort()
+            return 1
+
+        if args.avatars: download_batch_avatars(summaries, bundle)
+        if bundle is not None: bundle.close()
+        sox_output.sync_pending()
+    except OSError as e:
+        if bundle is None: raise
+        bundle.abort()
+        sox_log.error(f"Could not write {args.output}: {e}")
+        return 1
+    except BaseException:
+        if bundle is not None: bundle.abort()
+        raise
+    print_summary(summaries)
+    for path, write, what in ((args.report, sox_metrics.write_report, "run report"),
+                              (args.trace, sox_metrics.write_trace, "trace")):
+        if not path: continue
+        try:
+            write(path)
+            print(f"{what.capitalize()} written to {path}")
+        except OSError as e:
+            print(f"Could not write the {what} {path}: {e}")
+    return 1 if any(s.failed for s in summaries) else 0
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support() # Worker processes of a frozen (PyInstaller) build
+    sys.exit(main())
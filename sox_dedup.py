@@ -0,0 +1,118 @@
+"""Index of the character cards already written, to write each unique xoul only once.
+
+Every chat backup carries the xouls that took part in it, so extracting many
+backups produces the same card again and again, and two different xouls
+with the same name used to overwrite each other's file. The index keys cards
+by the xoul's identity (its slug, else its name) plus the SHA-256 of the
+converted card:
+
+    same identity, same card        -> a duplicate, not written again
+    same identity, different card   -> a variant, written next to the first
+                                       as "<name>_<first 8 hex digits of the hash>.json"
+    different identity, same name   -> likewise gets the hash suffix
+
+An index opened on a directory is kept there as .sox_characters.json, so
+extracting the next backup into the same folder skips what earlier ones
+already wrote. Without a directory it only lives for the current run (the
+batch CLI uses one per run).
+"""
+import hashlib
+import json
+import os
+
+import sox_engine
+import sox_json
+from sox_output import atomic_open
+
+INDEX_NAME = ".sox_characters.json"
+HASH_SUFFIX_LENGTH = 8
+
+
+def card_hash(card):
+    """SHA-256 of a card's content; key order and formatting do not matter."""
+    # Always the stdlib encoder, so the hashes in an index do not depend on the JSON backend
+    encoded = json.dumps(card, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+def card_key(output):
+    """(identity, card hash) of an OutputFile that is a xoul card, else None."""
+    if output.identity is None or output.is_jsonl: return None
+    return output.identity, card_hash(output.data)
+
+
+class CharacterIndex:
+    """identity -> {card hash: file name} for one output folder (or one run).
+
+    Names are file names relative to `directory`; an index without one
+    holds whatever names its writer uses (output paths, bundle member
+    names). Not thread safe.
+    """
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.path = os.path.join(directory, INDEX_NAME) if directory else None
+        self._cards = self._load() if self.path else {}
+        self._names = {name.lower() for variants in self._cards.values() for name in variants.values()}
+        self._dirty = False
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                cards = sox_json.load(f)
+            return cards if isinstance(cards, dict) else {}
+        except (OSError, ValueError):
+            return {} # Missing or corrupt: cards already on disk are just written again
+
+    def find(self, identity, digest):
+        """Name the card was written under, or None if it is new (or its file has gone)."""
+        name = self._cards.get(identity, {}).get(digest)
+        if name is None: return None
+        if self.directory and not os.path.exists(os.path.join(self.directory, name)):
+            self._forget(identity, digest)
+            return None
+        return name
+
+    def name_for(self, identity, digest, name):
+        """The name a new card should get: `name`, with the hash suffix if another card already has
+        it or the identity already has a variant."""
+        if self._cards.get(identity) or name.lower() in self._names:
+            base_name, file_ext = os.path.splitext(name)
+            return f"{base_name}_{digest[:HASH_SUFFIX_LENGTH]}{file_ext}"
+        return name
+
+    def add(self, identity, digest, name):
+        """Records that the card was written as `name`."""
+        self._cards.setdefault(identity, {})[digest] = name
+        self._names.add(name.lower())
+        self._dirty = True
+
+    def _forget(self, identity, digest):
+        name = self._cards[identity].pop(digest)
+        if not self._cards[identity]: del self._cards[identity]
+        self._names.discard(name.lower())
+        self._dirty = True
+
+    def save(self):
+        """Writes the index (atomically) if it is kept in a directory and changed."""
+        if not self.path or not self._dirty: return
+        with atomic_open(self.path) as f:
+            sox_json.dump(self._cards, f)
+        self._dirty = False
+
+
+def save_output(output, directory, index, names=None):
+    """Saves an OutputFile into `directory`, unless it is a card `index` already has.
+
+    Returns the path written, or None for a repeated card. With a
+    sox_names.NameAllocator the name is made unique instead of overwriting
+    an existing file. Raises ConversionError like sox_engine.save_json().
+    """
+    key = card_key(output)
+    name = output.name
+    if key is not None:
+        if index.find(*key) is not None: return None
+        name = index.name_for(*key, name)
+    path = names.allocate(directory, name) if names is not None else os.path.join(directory, name)
+    sox_engine.save_json(output.data, path, is_jsonl=output.is_jsonl)
+    if key is not None: index.add(*key, os.path.basename(path))
+    return path
@@ -0,0 +1,253 @@
+"""Parsed input documents shared between the SOXHub tools.
+
+Each hub tool used to load its own copy of the file it was given, so
+running the chat converter, both extractors and the avatar downloader on
+one backup parsed it four times and could keep four copies in memory. A
+DocumentStore parses a file once and hands every tool the same document
+until the file changes (it is keyed by path and modification time):
+
+    documents = DocumentStore()
+    data = documents.load(path, owner=tool)  # parsed, or shared if already here
+    ...
+    documents.release(tool)                  # the tool is done with it
+
+Documents are read-only, since every tool sees the same one: their dicts
+and lists are FrozenDict/FrozenList, which raise TypeError on any change
+(copy() or dict()/list() give a writable copy of that level). Nothing is
+copied up front: freeze() only wraps the top of the freshly parsed
+document, and each dict or list in it is wrapped the first time it is
+read (replacing the parsed one, which is then freed), so a document never
+takes twice its memory and every level of it is frozen, a chat's messages
+included. Reading through the wrappers costs a Python call per lookup;
+serializers (sox_json) read them like plain dicts and lists.
+
+A document held by an owner stays until release(owner) or the owner's
+next load(). The store may be used from several threads (the HUB loads
+on worker threads); files are parsed outside its lock. Documents nobody holds are kept for the next tool, least
+recently used first out, while their estimated size stays under
+`max_idle_bytes` and the system has memory to spare.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import sox_engine
+import sox_log
+import sox_metrics
+
+DEFAULT_MAX_IDLE_BYTES = 512 * 1024 * 1024
+LOW_MEMORY_BYTES = 512 * 1024 * 1024 # idle documents are all dropped when less than this is available
+PARSED_SIZE_FACTOR = 3 # a parsed document takes about this many times its file size in memory
+
+
+_MISSING = object()
+
+
+def _read_only(self, *args, **kwargs):
+    raise TypeError(f"{type(self).__name__} is a shared, read-only document: change a copy() of it instead")
+
+
+def _frozen(value):
+    """`value` wrapped read-only if it is a parsed dict or list, else as is."""
+    kind = type(value)
+    if kind is dict: return FrozenDict(value)
+    if kind is list: return FrozenList(value)
+    return value
+
+
+class FrozenDict(dict):
+    """A dict that cannot be changed; the dicts and lists in it are wrapped as they are read."""
+    __slots__ = ()
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        if type(value) is dict or type(value) is list:
+            value = _frozen(value)
+            dict.__setitem__(self, key, value) # Only the wrapper is kept from now on
+        return value
+
+    def get(self, key, default=None):
+        value = dict.get(self, key, _MISSING)
+        if value is _MISSING: return default
+        if type(value) is dict or type(value) is list:
+            value = _frozen(value)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def __iter__(self):
+        # Not dict's own iterator, so dict(self) and {**self} read values through __getitem__
+        return iter(dict.keys(self))
+
+    def values(self):
+        return [self[key] for key in dict.keys(self)]
+
+    def items(self):
+        return [(key, self[key]) for key in dict.keys(self)]
+
+    def copy(self):
+        return dict(self)
+
+    def __or__(self, other):
+        return dict(self) | other
+
+    def __reduce__(self):
+        return (type(self), (dict(self),))
+
+
+class FrozenList(list):
+    """A list that cannot be changed; the dicts and lists in it are wrapped as they are read."""
+    __slots__ = ()
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = pop = remove = clear = sort = reverse = _read_only
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        value = list.__getitem__(self, index)
+        if type(value) is dict or type(value) is list:
+            value = _frozen(value)
+            list.__setitem__(self, index, value)
+        return value
+
+    def __iter__(self):
+        for index, value in enumerate(list.__iter__(self)):
+            if type(value) is dict or type(value) is list:
+                value = _frozen(value)
+                list.__setitem__(self, index, value)
+            yield value
+
+    def __reversed__(self):
+        for index in range(len(self) - 1, -1, -1):
+            yield self[index]
+
+    def copy(self):
+        return list(self)
+
+    def __add__(self, other):
+        return list(self) + other
+
+    def __mul__(self, count):
+        return list(self) * count
+
+    __rmul__ = __mul__
+
+    def __reduce__(self):
+        return (type(self), (list(self),))
+
+
+def freeze(value):
+    """`value`, a freshly parsed JSON value, made read-only (see FrozenDict/FrozenList).
+
+    The top dict or list is copied (not what is in it); drop `value` afterwards.
+    """
+    return _frozen(value)
+
+
+def available_memory():
+    """Bytes of memory the system can still give out, or None where that is not known."""
+    if os.name == 'nt':
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                        ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                        ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                        ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                        ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+        status = MemoryStatus()
+        status.dwLength = ctypes.sizeof(status)
+        if not ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)): return None
+        return status.ullAvailPhys
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'): return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class _Entry:
+    __slots__ = ("data", "stamp", "size")
+
+    def __init__(self, data, stamp, size):
+        self.data = data
+        self.stamp = stamp
+        self.size = size
+
+
+class DocumentStore:
+    """Parses each input file once for all the tools that open it (see the module docstring)."""
+    def __init__(self, max_idle_bytes=DEFAULT_MAX_IDLE_BYTES, low_memory_bytes=LOW_MEMORY_BYTES):
+        self.max_idle_bytes = max_idle_bytes
+        self.low_memory_bytes = low_memory_bytes
+        self._entries = OrderedDict() # (path, stream_key) -> _Entry, least recently used first
+        self._holds = {} # owner -> (path, stream_key)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def load(self, filename, stream_key=None, owner=None):
+        """The read-only document in `filename`, parsed only if it is not here or the file changed since.
+
+        Arguments are those of sox_engine.load_json, which raises
+        ConversionError (nothing is kept then). With an `owner` (any
+        hashable, e.g. the tool) the document is held for it, and what it
+        held before is let go.
+        """
+        key = (os.path.abspath(filename), stream_key)
+        try:
+            stat = os.stat(filename)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return sox_engine.load_json(filename, stream_key) # Raises the engine's error for it
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.stamp == stamp:
+                self._entries.move_to_end(key)
+                sox_metrics.count("documents_shared")
+                return self._hold(owner, key, entry)
+            # A skeleton's streamed array is read from the file each time, so only the rest takes memory
+            size = stat.st_size * PARSED_SIZE_FACTOR if stream_key is None else 0
+            self._trim(room=size)
+        entry = _Entry(freeze(sox_engine.load_json(filename, stream_key)), stamp, size)
+        sox_metrics.count("documents_parsed")
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            return self._hold(owner, key, entry)
+
+    def _hold(self, owner, key, entry):
+        """Records what `owner` holds and returns the entry's document (caller holds _lock)."""
+        if owner is not None:
+            self._holds[owner] = key
+        self._trim()
+        return entry.data
+
+    def release(self, owner):
+        """Lets go of what `owner` holds; it stays only while there is room for idle documents."""
+        with self._lock:
+            if self._holds.pop(owner, None) is not None: self._trim()
+
+    def clear(self):
+        """Drops every document (tools still using one keep their reference to it)."""
+        with self._lock:
+            self._entries.clear()
+            self._holds.clear()
+
+    def _trim(self, room=0):
+        """Drops idle documents, oldest first, until `room` more bytes fit and memory is not short (caller holds _lock)."""
+        held = set(self._holds.values())
+        idle = [key for key in self._entries if key not in held]
+        idle_bytes = sum(self._entries[key].size for key in idle)
+        available = available_memory() if idle else None
+        for key in idle:
+            short = available is not None and available < self.low_memory_bytes + room
+            if idle_bytes + room <= self.max_idle_bytes and not short: break
+            entry = self._entries.pop(key)
+            idle_bytes -= entry.size
+            if available is not None: available += entry.size
+            sox_log.debug(f"Dropped {key[0]} from the shared documents", "document_evicted", path=key[0])
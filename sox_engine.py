@@ -0,0 +1,1100 @@
+"""Headless conversion engine for the S.O.X. Project tools.
+
+Every XoulAI -> TavernAI conversion lives here as plain Python with no Qt
+import, so it can run on a machine without a display or be driven from
+scripts. The SOXHub Tool_* widgets are thin shells over these functions: they
+pick files, call the engine and turn ConversionError into message boxes.
+"""
+import json
+import os
+import re
+import hashlib
+import threading
+import time
+from urllib.parse import urlparse
+
+from sox_archive import file_size, open_binary
+import sox_json
+import sox_log
+import sox_metrics
+from sox_names import NameAllocator, sanitize
+from sox_output import atomic_open, write_jsonl
+from sox_stream import StreamedArray, closing_iter, load_skeleton
+from sox_timestamps import format_timestamp
+
+# Chat backups at least this big are read with the streaming parser (see sox_stream)
+STREAMING_THRESHOLD_BYTES = 64 * 1024 * 1024
+
+
+# --- Errors ---
+class ConversionError(Exception):
+    """Raised when an input cannot be loaded, validated, converted or saved.
+
+    `title` is a short caption the GUI uses for its message box.
+    """
+    def __init__(self, message, title="Error"):
+        super().__init__(message)
+        self.title = title
+
+
+class NothingToConvert(ConversionError):
+    """Raised when the input is valid but holds nothing to convert."""
+    def __init__(self, message, title="Info"):
+        super().__init__(message, title)
+
+
+class Cancelled(ConversionError):
+    """Raised inside a long-running engine call after Progress.cancel()."""
+    def __init__(self, message="Operation cancelled by the user.", title="Cancelled"):
+        super().__init__(message, title)
+
+
+# --- Progress / cancellation ---
+class Progress:
+    """Progress reporting and cancellation hook for long-running engine calls.
+
+    `callback(done, total)` is called from whatever thread runs the job; the
+    GUI passes a Qt signal's emit so updates are queued to the main thread.
+    cancel() may be called from any thread; the job stops at its next update().
+    """
+    def __init__(self, callback=None):
+        self.callback = callback
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def update(self, done, total=0):
+        if self._cancelled.is_set():
+            raise Cancelled()
+        if self.callback: self.callback(done, total)
+
+
+PROGRESS_EVERY = 256 # messages between progress updates in the chat loop
+
+
+# --- Results ---
+# Where each kind of output lives in a SillyTavern data directory (OutputFile.folder)
+CHARACTERS_FOLDER = "characters"
+WORLDS_FOLDER = "worlds"
+CHATS_FOLDER = "chats" # one subfolder per character
+GROUP_CHATS_FOLDER = "group chats"
+
+
+class OutputFile:
+    """One file produced by a conversion: suggested file name, payload and format.
+
+    `folder` is where the file belongs in a SillyTavern data directory ("" for
+    the top level); output bundles are laid out by it. `identity` (a xoul's
+    slug) marks cards the same xoul yields in every backup, so writers can
+    skip repeats (see sox_dedup).
+    """
+    def __init__(self, name, data, is_jsonl=False, folder="", identity=None):
+        self.name = name
+        self.data = data
+        self.is_jsonl = is_jsonl
+        self.folder = folder
+        self.identity = identity
+
+
+class ConversionResult:
+    """Outputs of a conversion plus the per-item bookkeeping the tools report."""
+    def __init__(self):
+        self.outputs = []      # list of OutputFile
+        self.item_count = 0    # converted messages / entries / cards
+        self.failed_count = 0  # items skipped or failed
+        self.errors = []       # per-item details, shown as "Processing Details"
+        self.warnings = []     # non-fatal problems with the input as a whole
+        self.avatar_urls = set() # image URLs met on the way (filled by migrate_chat_backup)
+
+
+# --- Loading / saving ---
+def load_json(filename, stream_key=None):
+    """Loads a JSON file with UTF-8 encoding, raising ConversionError on failure.
+
+    `filename` may also be a sox_archive.ArchiveMember, read straight from its archive.
+    Parsing goes through sox_json (orjson when installed). With `stream_key`
+    (e.g. "messages") that top-level array is not loaded but returned as a
+    StreamedArray, which the converters iterate item by item.
+    """
+    try:
+        with sox_metrics.span("load"):
+            if sox_metrics.enabled(): sox_metrics.count("bytes_read", file_size(filename))
+            if stream_key:
+                return load_skeleton(filename, stream_key)
+            with open_binary(filename) as f:
+                return sox_json.load(f)
+    except FileNotFoundError:
+        raise ConversionError(f"File not found:\n{filename}")
+    except json.JSONDecodeError as e:
+        raise ConversionError(f"Failed to parse JSON from file:\n{filename}\n{e}", "JSON Parsing Error")
+    except UnicodeDecodeError as e:
+        raise ConversionError(f"Failed to read file with UTF-8 encoding:\n{filename}\n{e}\n\n"
+                              f"Try opening it in a text editor and saving as UTF-8.", "Encoding Error")
+    except Exception as e:
+        raise ConversionError(f"An unexpected error occurred while reading the file:\n{filename}\n{e}",
+                              "File Reading Error")
+
+
+def save_json(data, filename, indent=4, is_jsonl=False):
+    """Saves data to a JSON or JSON Lines file with UTF-8 encoding, raising ConversionError on failure.
+
+    JSON is pretty-printed with `indent` spaces, or written on one line with
+    indent=None (see sox_json for the exact layouts).
+
+    For JSON Lines `data` may be any iterable (e.g. a converter's generator);
+    records are written as they are produced. The file is written under a
+    temporary name and only then replaces `filename` (see
+    sox_output.atomic_open), so if producing or writing fails nothing is
+    left behind and an existing file is untouched.
+    """
+    try:
+        with atomic_open(filename) as f:
+            if is_jsonl:
+                # A single dict passed with is_jsonl is written as a one-line file
+                write_jsonl([data] if isinstance(data, dict) else data, f)
+            else:
+                with sox_metrics.span("encode"):
+                    text = sox_json.dumps(data, indent)
+                with sox_metrics.span("write"):
+                    f.write(text)
+    except ConversionError:
+        raise
+    except IOError as e:
+        raise ConversionError(f"Failed to write the output file:\n{filename}\n{e}", "File Writing Error")
+    except Exception as e:
+        raise ConversionError(f"An unexpected error occurred while saving:\n{filename}\n{e}", "General Error")
+
+
+
+def should_stream(filename):
+    """True when a file is big enough that its messages should be streamed."""
+    try:
+        return file_size(filename) >= STREAMING_THRESHOLD_BYTES
+    except OSError:
+        return False
+
+
+def sanitize_filename_base(name, fallback):
+    """Turns a character/scenario name into a file name base (no extension)."""
+    return sanitize(name, fallback)
+
+
+# --- Input shape checks (mirrors the tools' _check_enable_save) ---
+def _is_list(value):
+    return isinstance(value, (list, StreamedArray))
+
+
+def is_character_json(data):
+    return isinstance(data, dict) and "name" in data
+
+
+def is_persona_backup(data):
+    return isinstance(data, dict) and 'personas' in data and 'persona_descriptions' in data
+
+
+def is_persona_json(data):
+    return isinstance(data, dict) and 'name' in data and 'prompt' in data
+
+
+def is_scenario_json(data):
+    return isinstance(data, dict) and ("name" in data or "prompt" in data)
+
+
+def is_lorebook_json(data):
+    return isinstance(data, dict) and \
+        isinstance(data.get("embedded"), dict) and \
+        isinstance(data["embedded"].get("sections"), list)
+
+
+def is_chat_json(data):
+    """Chat backup with top-level 'messages' and 'conversation.personas/xouls' (single and group chats)."""
+    return isinstance(data, dict) and \
+        _is_list(data.get("messages")) and \
+        isinstance(data.get("conversation"), dict) and \
+        isinstance(data["conversation"].get("personas"), list) and \
+        isinstance(data["conversation"].get("xouls"), list)
+
+
+def has_chat_xouls(data):
+    """Chat backup usable for character extraction ('conversation.xouls')."""
+    return isinstance(data, dict) and \
+        isinstance(data.get("conversation"), dict) and \
+        isinstance(data["conversation"].get("xouls"), list)
+
+
+def has_chat_scenario(data):
+    """Chat backup usable for scenario extraction ('conversation.scenario.prompt')."""
+    return isinstance(data, dict) and \
+        isinstance(data.get("conversation"), dict) and \
+        isinstance(data["conversation"].get("scenario"), dict) and \
+        isinstance(data["conversation"]["scenario"].get("prompt"), list)
+
+
+# --- TavernAI building blocks ---
+def make_world_entry(uid, key, comment, content, constant, display_index):
+    """Builds one TavernAI World Info entry."""
+    return {
+        "uid": uid, "key": key, "keysecondary": [],
+        "comment": comment, "content": content,
+        "constant": constant, "vectorized": False, "selective": True,
+        "selectiveLogic": 0, "addMemo": True, "order": 100,
+        "position": 0, "disable": False, "excludeRecursion": False,
+        "preventRecursion": False, "delayUntilRecursion": False,
+        "probability": 100, "useProbability": True, "depth": 4,
+        "group": "", "groupOverride": False, "groupWeight": 100,
+        "scanDepth": None, "caseSensitive": None, "matchWholeWords": None,
+        "useGroupScoring": None, "automationId": "", "role": None,
+        "sticky": 0, "cooldown": 0, "delay": 0, "displayIndex": display_index
+    }
+
+
+def make_character_card(character_data, full=True):
+    """Builds a TavernAI character card from a Xoul character.
+
+    `full=False` is the reduced card used when extracting xouls from a chat
+    backup, where definition/scenario/greeting/tags are not available.
+    """
+    return {
+        "name": character_data.get("name", ""), "description": character_data.get("backstory", ""),
+        "personality": character_data.get("definition", "") if full else "",
+        "scenario": character_data.get("default_scenario", "") if full else "",
+        "first_mes": character_data.get("greeting", "") if full else "",
+        "mes_example": character_data.get("samples", ""),
+        "creator_notes": character_data.get("bio", ""), "system_prompt": "", "post_history_instructions": "",
+        "tags": character_data.get("social_tags", []) if full else [],
+        "creator": character_data.get("slug", ""),
+        "character_version": "imported", "alternate_greetings": [],
+        "extensions": {
+            "talkativeness": str(character_data.get("talkativeness", "0.5")), "fav": False, "world": "",
+            "depth_prompt": {"prompt": "", "depth": 4, "role": "system"}
+        },
+        "group_only_greetings": []
+    }
+
+
+def build_scenario_content(scenario_prompt, familiarity, location):
+    """Appends the familiarity/location spec lines to a scenario prompt."""
+    content_parts = [scenario_prompt]
+    spec_lines = []
+    if isinstance(familiarity, str) and familiarity: spec_lines.append(f"{{{{char}}}} are: {familiarity}")
+    if isinstance(location, str) and location: spec_lines.append(f"location: {location}")
+
+    if spec_lines:
+        if scenario_prompt.strip(): content_parts.append("\n\n" + "\n".join(spec_lines))
+        else: content_parts.append("\n".join(spec_lines))
+
+    return "".join(content_parts).strip()
+
+
+def _timestamp_or_blank(raw_timestamp, i):
+    try:
+        return format_timestamp(raw_timestamp)
+    except Exception as e:
+        sox_log.repeated("timestamp parse failures", "Failed to parse timestamp '%s' for message at index %d: %s",
+                         raw_timestamp, i, e)
+        return ""
+
+
+# --- 1. Character Converter ---
+@sox_metrics.timed("transform")
+def convert_character(data):
+    if not is_character_json(data):
+        raise ConversionError("No valid JSON data loaded! Please load a Xoul character JSON first.")
+
+    result = ConversionResult()
+    filename_base = sanitize_filename_base(data.get("name") or data.get("slug", "transformed_character"),
+                                           "transformed_character")
+    result.outputs.append(OutputFile(f"{filename_base}.json", make_character_card(data), folder=CHARACTERS_FOLDER))
+    result.item_count = 1
+    return result
+
+
+# --- 2. Persona Adding (to TavernAI Backup) ---
+@sox_metrics.timed("transform")
+def add_persona(backup_data, persona_data, source_name=None):
+    """Adds a Xoul persona to a TavernAI persona backup, returning the modified backup."""
+    if not (is_persona_backup(backup_data) and is_persona_json(persona_data)):
+        raise ConversionError("Please load both valid JSON files first.", "Warning")
+
+    new_persona_name = persona_data.get('name')
+    new_description = persona_data.get('prompt')
+    if not isinstance(new_persona_name, str) or not new_persona_name or not isinstance(new_description, str):
+        sox_log.error("Xoul Persona JSON missing 'name' or 'prompt' or they are not non-empty strings.")
+        raise ConversionError("Xoul Persona JSON must contain 'name' and 'prompt' string keys with values.", "Warning")
+
+    output_data = backup_data.copy()
+
+    if not isinstance(output_data.get('personas'), dict):
+        sox_log.warning("'personas' key not found or not a dictionary in backup. Creating/replacing.")
+        output_data['personas'] = {}
+    else:
+        output_data['personas'] = dict(output_data['personas'])
+
+    # The HUB's key has always had "_" for spaces (the standalone Persona script keeps them)
+    filename_base = sanitize(new_persona_name, "")
+    if not filename_base or filename_base.startswith('.'):
+        hash_object = hashlib.md5(new_persona_name.encode()).hexdigest()
+        filename_base = f"persona_{hash_object[:8]}"
+
+    persona_dict_key = f"{filename_base}.png"
+    output_data['personas'][persona_dict_key] = new_persona_name
+
+    if not isinstance(output_data.get('persona_descriptions'), dict):
+        sox_log.warning("'persona_descriptions' key not found or not a dictionary in backup. Creating/replacing.")
+        output_data['persona_descriptions'] = {}
+    else:
+        output_data['persona_descriptions'] = dict(output_data['persona_descriptions'])
+
+    output_data['persona_descriptions'][persona_dict_key] = {"description": new_description, "position": 0}
+
+    default_save_name = "modified_persona_backup.json"
+    if source_name:
+        base, ext = os.path.splitext(os.path.basename(source_name))
+        default_save_name = f"{base}_modified.json"
+
+    result = ConversionResult()
+    result.outputs.append(OutputFile(default_save_name, output_data))
+    result.item_count = 1
+    return result
+
+
+# --- 3. Scenario Converter ---
+@sox_metrics.timed("transform")
+def convert_scenario(data):
+    if not is_scenario_json(data):
+        raise ConversionError("No valid JSON data loaded! Please load a scenario JSON first.")
+
+    scenario_name = data.get("name", "")
+    scenario_prompt = data.get("prompt", "")
+    prompt_spec = data.get("prompt_spec", {})
+
+    familiarity = location = None
+    if isinstance(prompt_spec, dict):
+        familiarity = prompt_spec.get("familiarity")
+        location = prompt_spec.get("location")
+    content = build_scenario_content(scenario_prompt, familiarity, location)
+
+    output_json = {"entries": {"0": make_world_entry(0, [], scenario_name, content, True, 0)}}
+
+    result = ConversionResult()
+    filename_base = sanitize_filename_base(scenario_name or "converted_scenario", "converted_scenario")
+    result.outputs.append(OutputFile(f"{filename_base}.json", output_json, folder=WORLDS_FOLDER))
+    result.item_count = 1
+    return result
+
+
+# --- 4. Lorebook Converter ---
+@sox_metrics.timed("transform")
+def convert_lorebook(data, source_name=None):
+    if not is_lorebook_json(data):
+        raise ConversionError("No valid Lorebook JSON data loaded or structure is invalid!")
+
+    sections_list = data["embedded"]["sections"]
+    if not sections_list:
+        raise NothingToConvert("No 'sections' found in the loaded Lorebook JSON to convert.")
+
+    result = ConversionResult()
+    entries_dict = {}
+    for i, section in enumerate(sections_list):
+        if not isinstance(section, dict):
+            result.failed_count += 1
+            result.errors.append(f"Skipping item at index {i}: Data is not a dictionary.")
+            sox_log.repeated("lorebook sections skipped", "Processing item at index %d: Expected dictionary, got %s",
+                             i, type(section), level=sox_log.ERROR)
+            continue
+        try:
+            entries_dict[str(i)] = make_world_entry(i, section.get("keywords", []), section.get("name", ""),
+                                                    section.get("text", ""), False, i)
+        except Exception as e:
+            result.failed_count += 1
+            section_identifier = section.get("name", f"index_{i}")
+            result.errors.append(f"Failed to process section '{section_identifier}': {e}")
+            sox_log.repeated("lorebook sections skipped", "Processing section %s: %s", section_identifier, e,
+                             level=sox_log.ERROR)
+
+    if not entries_dict:
+        raise NothingToConvert("No valid sections were successfully processed from the Lorebook JSON.")
+
+    default_save_name = "converted_lorebook.json"
+    if source_name:
+        base, ext = os.path.splitext(os.path.basename(source_name))
+        default_save_name = f"{base}_world.json"
+
+    result.outputs.append(OutputFile(default_save_name, {"entries": entries_dict}, folder=WORLDS_FOLDER))
+    result.item_count = len(entries_dict)
+    return result
+
+
+# --- Chat message loop shared by both chat converters ---
+def _iter_chat_messages(messages_list, convert_one, result, progress=None, observe=None):
+    """Yields converted messages one at a time, counting skipped/failed ones on `result`.
+
+    `observe(message)`, if given, also sees every raw message (so other
+    outputs can be gathered in the same pass). Raises ConversionError at the
+    end if nothing could be converted.
+
+    With sox_metrics on, the time spent in here (not in the consumer) is
+    reported as one "transform" span, and the messages as counters.
+    """
+    total = len(messages_list)
+    start_count = result.item_count
+    timed = sox_metrics.enabled()
+    spent = failed = 0
+    resumed = time.perf_counter() if timed else 0
+    try:
+        with closing_iter(messages_list) as messages: # A cancel or error stops mid-file
+            for i, message in enumerate(messages):
+                if progress and i % PROGRESS_EVERY == 0: progress.update(i, total)
+                if observe: observe(message)
+                try:
+                    output_message = convert_one(message, i)
+                except Exception as e:
+                    sox_log.repeated("messages that failed to convert", "Processing message at index %d: %s", i, e,
+                                     level=sox_log.ERROR)
+                    output_message = None
+                if output_message is None:
+                    result.failed_count += 1
+                    failed += 1
+                else:
+                    result.item_count += 1
+                    if timed: spent += time.perf_counter() - resumed
+                    yield output_message
+                    if timed: resumed = time.perf_counter()
+    finally:
+        if timed:
+            sox_metrics.record("transform", spent + time.perf_counter() - resumed)
+            sox_metrics.count("messages", result.item_count - start_count)
+            if failed: sox_metrics.count("messages_failed", failed)
+
+    if progress: progress.update(total, total)
+    if result.item_count == start_count:
+        sox_log.error("No messages converted.")
+        raise ConversionError("No messages were successfully processed from the chat JSON.", "Conversion Failed")
+
+
+# --- 5. Single Chat Converter (to JSON Lines) ---
+def convert_single_chat_message(message, i, username, character_name):
+    """Converts one single-chat message. Returns None when the message is skipped."""
+    if not isinstance(message, dict):
+        sox_log.repeated("messages skipped", "Skipping message at index %d: Item is not a dictionary.", i)
+        return None
+
+    role = message.get('role')
+    if role == 'user':
+        sender_name, is_user, is_system = username, True, False
+    elif role == 'assistant':
+        sender_name, is_user, is_system = character_name, False, False
+    elif role == 'system':
+        sender_name, is_user, is_system = 'System', False, True
+    else:
+        sox_log.repeated("messages skipped", "Skipping message at index %d: Unexpected role '%s'.", i, role)
+        return None # Skip message with unhandled role
+
+    # TavernAI jsonl message object structure (no force_avatar in single character chats)
+    return {
+        "name": sender_name,
+        "is_user": is_user,
+        "is_system": is_system,
+        "send_date": _timestamp_or_blank(message.get('timestamp'), i),
+        "mes": message.get('content', '')
+    }
+
+
+@sox_metrics.timed("transform")
+def convert_single_chat(data, source_name=None, progress=None, result=None, observe=None):
+    """Converts a single-character chat backup. `result`/`observe` let migrate_chat_backup share the pass."""
+    if not is_chat_json(data):
+        raise ConversionError("No valid Chat JSON data loaded or structure is invalid!")
+
+    if result is None: result = ConversionResult()
+    personas_list = data['conversation']['personas']
+    xouls_list = data['conversation']['xouls']
+    messages_list = data['messages']
+
+    if len(personas_list) == 0:
+        sox_log.warning("No 'personas' list found or it's empty in the chat JSON.")
+        result.warnings.append("No 'personas' list found or it's empty in the chat JSON.")
+    if len(xouls_list) == 0:
+        sox_log.warning("No 'xouls' list found or it's empty in the chat JSON.")
+        result.warnings.append("No 'xouls' list found or it's empty in the chat JSON.")
+
+    if len(messages_list) == 0:
+        raise NothingToConvert("No 'messages' found in the chat JSON to convert.")
+
+    first_persona = personas_list[0] if len(personas_list) > 0 and isinstance(personas_list[0], dict) else {}
+    first_xoul = xouls_list[0] if len(xouls_list) > 0 and isinstance(xouls_list[0], dict) else {}
+    username = first_persona.get('name', 'User')
+    character_name = first_xoul.get('name', 'Character')
+
+    output_messages = _iter_chat_messages(
+        messages_list, lambda message, i: convert_single_chat_message(message, i, username, character_name),
+        result, progress, observe)
+
+    # SillyTavern keeps a character's chats in a folder named like its card (see extract_characters)
+    card_name = sanitize_filename_base(character_name if isinstance(character_name, str) else "", "Character")
+    chat_folder = f"{CHATS_FOLDER}/{card_name}"
+    default_save_name = "converted_chat.jsonl"
+    if source_name:
+        base, ext = os.path.splitext(os.path.basename(source_name))
+        default_save_name = f"{base}.jsonl"
+
+    # Messages are converted lazily while the output is written; item_count/failed_count fill in then
+    result.outputs.append(OutputFile(default_save_name, output_messages, is_jsonl=True, folder=chat_folder))
+    return result
+
+
+# --- 6. Group Chat Converter (to JSON Lines) ---
+def build_avatar_index(entries):
+    """Maps name -> icon_url for a chat's personas or xouls, built once per conversation.
+
+    When several entries share a name the first one wins (even if it has no
+    icon_url), matching the linear scan this replaces. Non-dict entries and
+    unhashable names are ignored.
+    """
+    index = {}
+    if not _is_list(entries): return index
+    for entry in entries:
+        if not isinstance(entry, dict): continue
+        try:
+            index.setdefault(entry.get('name'), entry.get('icon_url'))
+        except TypeError:
+            pass
+    return index
+
+
+def find_avatar_url(index, author_name):
+    """icon_url for author_name in an index from build_avatar_index, or None."""
+    try:
+        return index.get(author_name)
+    except TypeError:
+        return None
+
+
+def convert_multi_chat_message(message, i, persona_icons, xoul_icons):
+    """Converts one group-chat message. Returns None when the message is skipped.
+
+    persona_icons/xoul_icons are build_avatar_index() tables for the conversation.
+    """
+    if not isinstance(message, dict):
+        sox_log.repeated("messages skipped", "Skipping message at index %d: Item is not a dictionary.", i)
+        return None
+
+    author_name = message.get('author_name')
+    author_type = message.get('author_type') # 'user' or 'llm'
+    raw_timestamp = message.get('timestamp')
+    content = message.get('content')
+
+    if not all([author_name, author_type]) or raw_timestamp is None or content is None: # timestamp can be 0
+        sox_log.repeated("messages skipped", "Skipping message due to missing essential data (author_name, author_type,"
+                         " timestamp, or content): %s", message.get('message_id', f'index_{i}'))
+        return None
+
+    is_user = (author_type == 'user')
+    is_system = (author_type == 'system')
+    if author_type not in ['user', 'llm', 'system']:
+        sox_log.repeated("messages with an unknown author_type", "Unknown author_type '%s' for message at index %d."
+                         " Treating as non-user/non-system.", author_type, i)
+
+    # --- Find AVATAR URL based on author_name and author_type ---
+    avatar_url = None
+    if author_type == 'user':
+        avatar_url = find_avatar_url(persona_icons, author_name)
+    elif author_type == 'llm':
+        avatar_url = find_avatar_url(xoul_icons, author_name)
+    # Note: System messages usually don't have avatars
+
+    return {
+        "name": author_name, "is_user": is_user, "is_system": is_system,
+        "send_date": _timestamp_or_blank(raw_timestamp, i),
+        "mes": content, "force_avatar": avatar_url
+    }
+
+
+@sox_metrics.timed("transform")
+def convert_multi_chat(data, source_name=None, progress=None, result=None, observe=None):
+    """Converts a group chat backup. `result`/`observe` let migrate_chat_backup share the pass."""
+    if not is_chat_json(data):
+        raise ConversionError("No valid Chat JSON data loaded or structure is invalid!")
+
+    if result is None: result = ConversionResult()
+    conversation_data = data['conversation']
+    all_personas = conversation_data['personas']
+    all_xouls = conversation_data['xouls']
+    messages_list = data['messages']
+
+    if len(messages_list) == 0:
+        raise NothingToConvert("No 'messages' found in the chat JSON to convert.")
+
+    if len(all_personas) == 0:
+        sox_log.warning("No 'personas' list found or it's empty in the 'conversation' object. User avatars may not be displayed.")
+    if len(all_xouls) == 0:
+        sox_log.warning("No 'xouls' list found or it's empty in the 'conversation' object. LLM avatars may not be displayed.")
+
+    # Name lookups are done once here instead of scanning both lists for every message
+    persona_icons = build_avatar_index(all_personas)
+    xoul_icons = build_avatar_index(all_xouls)
+    output_messages = _iter_chat_messages(
+        messages_list, lambda message, i: convert_multi_chat_message(message, i, persona_icons, xoul_icons),
+        result, progress, observe)
+
+    default_save_name = "converted_group_chat.jsonl"
+    conv_name = conversation_data.get('name', 'group_chat')
+    if isinstance(conv_name, str):
+        sanitized_name = sanitize_filename_base(conv_name, "")
+        if sanitized_name: default_save_name = f"{sanitized_name}_converted.jsonl"
+
+    # Messages are converted lazily while the output is written; item_count/failed_count fill in then
+    result.outputs.append(OutputFile(default_save_name, output_messages, is_jsonl=True, folder=GROUP_CHATS_FOLDER))
+    return result
+
+
+# --- 7. Extract Characters (from Chat Backup) ---
+@sox_metrics.timed("transform")
+def extract_characters(data):
+    """Builds one reduced character card per xoul in a chat backup."""
+    if not has_chat_xouls(data):
+        raise ConversionError("No valid JSON data loaded or structure is invalid!")
+
+    xouls_list = data["conversation"]["xouls"]
+    if not xouls_list:
+        raise NothingToConvert("No 'xouls' characters list found or list is empty in the loaded JSON.")
+
+    result = ConversionResult()
+    for index, character_data in enumerate(xouls_list):
+        if not isinstance(character_data, dict):
+            result.failed_count += 1
+            result.errors.append(f"Skipping item at index {index}: Data is not a dictionary.")
+            sox_log.repeated("characters skipped", "Processing item at index %d: Expected dictionary, got %s",
+                             index, type(character_data), level=sox_log.ERROR)
+            continue
+        try:
+            output_json = make_character_card(character_data, full=False)
+            character_name_slug = character_data.get("name") or character_data.get("slug") or f"unknown_character_{index}"
+            filename_base = sanitize_filename_base(character_name_slug, f"character_{index}")
+            identity = character_data.get("slug") or character_data.get("name") or None
+            result.outputs.append(OutputFile(f"{filename_base}.json", output_json, folder=CHARACTERS_FOLDER,
+                                             identity=identity if isinstance(identity, str) else None))
+        except Exception as e:
+            result.failed_count += 1
+            char_identifier = character_data.get("slug", character_data.get("name", f"index_{index}"))
+            result.errors.append(f"Failed to process '{char_identifier}': {e}")
+            sox_log.repeated("characters skipped", "Processing character %s: %s", char_identifier, e,
+                             level=sox_log.ERROR)
+
+    result.item_count = len(result.outputs)
+    return result
+
+
+# --- 8. Extract Scenario (from Chat Backup) ---
+@sox_metrics.timed("transform")
+def extract_chat_scenario(data):
+    if not has_chat_scenario(data):
+        raise ConversionError("No valid Chat JSON data loaded or structure is invalid for scenario extraction!")
+
+    conversation_data = data["conversation"]
+    scenario_data = conversation_data["scenario"]
+
+    # Only the first prompt entry is used, and only if it is a string
+    prompt_list = scenario_data.get("prompt", [])
+    full_prompt_text = prompt_list[0] if len(prompt_list) > 0 and isinstance(prompt_list[0], str) else ""
+
+    scenario_name_potential = scenario_data.get("name")
+    conversation_name = conversation_data.get("name", "Unnamed Conversation")
+    scenario_name_for_comment = scenario_name_potential if scenario_name_potential is not None else conversation_name
+
+    familiarity = None
+    location = None
+    core_prompt_lines = []
+    for line in full_prompt_text.splitlines():
+        stripped_line = line.strip()
+        if stripped_line.lower().startswith("familiarity:"):
+            familiarity = stripped_line[len("familiarity:"):].strip()
+        elif stripped_line.lower().startswith("location:"):
+            location = stripped_line[len("location:"):].strip()
+        else:
+            core_prompt_lines.append(line)
+
+    content = build_scenario_content("\n".join(core_prompt_lines), familiarity, location)
+    if not content:
+        raise NothingToConvert("No significant scenario content found to extract.")
+
+    output_json = {"entries": {"0": make_world_entry(0, [], scenario_name_for_comment, content, True, 0)}}
+
+    result = ConversionResult()
+    filename_base = sanitize_filename_base(scenario_name_for_comment or "extracted_scenario", "extracted_scenario")
+    result.outputs.append(OutputFile(f"{filename_base}.json", output_json, folder=WORLDS_FOLDER))
+    result.item_count = 1
+    return result
+
+
+# --- 9. Avatar/Icon Downloader ---
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp', '.svg')
+
+
+def is_potential_image_url(url_string):
+    if not isinstance(url_string, str): return False
+    url_string_lower = url_string.lower()
+    if url_string_lower.startswith(('http://', 'https://')):
+        parsed_url = urlparse(url_string_lower)
+        # Also check query string as some URLs include extensions there
+        _, ext = os.path.splitext(parsed_url.path + parsed_url.query)
+        if ext in IMAGE_EXTENSIONS: return True
+        # Less reliable check: extension followed by end or ?
+        if re.search(r'\.(png|jpg|jpeg|gif|bmp|webp|svg)(\?|$)', url_string_lower): return True
+    return False
+
+
+def find_image_urls(data, found_urls=None, depth=0, max_depth=20):
+    """Collects every string that looks like an image URL anywhere in a JSON structure."""
+    if found_urls is None: found_urls = set()
+    if depth > max_depth: return found_urls # Prevent runaway recursion on deeply nested data
+    if isinstance(data, dict):
+        for value in data.values():
+            if is_potential_image_url(value):
+                found_urls.add(value)
+            find_image_urls(value, found_urls, depth + 1, max_depth)
+    elif isinstance(data, list):
+        for item in data:
+            if is_potential_image_url(item):
+                found_urls.add(item)
+            find_image_urls(item, found_urls, depth + 1, max_depth)
+    elif isinstance(data, str):
+        if is_potential_image_url(data):
+            found_urls.add(data)
+    return found_urls
+
+
+def _safe_filename_for_url(url):
+    """Sanitized file name (no directory, not made unique) for an image URL."""
+    try:
+        parsed_url = urlparse(url)
+        original_filename = os.path.basename(parsed_url.path)
+
+        # If path basename is generic or missing extension, look in query string
+        if not original_filename or not os.path.splitext(original_filename)[1]:
+            query_params = urlparse(f"?{parsed_url.query}").path
+            if query_params:
+                query_filename = os.path.basename(query_params)
+                if query_filename and os.path.splitext(query_filename)[1]:
+                    original_filename = query_filename
+
+        if not original_filename or original_filename == "/": original_filename = "downloaded_image"
+
+        safe_filename = sanitize(original_filename, "")
+        if not safe_filename or safe_filename.startswith('.'):
+            hash_object = hashlib.md5(url.encode()).hexdigest()
+            safe_filename = f"hashed_image_{hash_object[:8]}"
+        if '.' not in safe_filename and '.' in original_filename:
+            safe_filename += os.path.splitext(original_filename)[1]
+        if '.' not in safe_filename:
+            safe_filename += ".png" # Default to png if no extension found
+        return safe_filename
+    except Exception as e:
+        sox_log.error(f"Generating a safe filename for URL '{url}': {e}", "avatar_filename", url=url)
+        hash_object = hashlib.md5(url.encode()).hexdigest()
+        return f"error_hashed_image_{hash_object[:8]}.png"
+
+
+def get_safe_filename_from_url(url, directory, names=None):
+    """Builds a sanitized, not-yet-existing output path for an image URL.
+
+    Pass the same sox_names.NameAllocator for a whole run so URLs downloaded
+    in parallel never get the same path (and the directory is listed once).
+    """
+    return (names or NameAllocator()).allocate(directory, _safe_filename_for_url(url))
+
+
+def _is_cached_copy(path, blob_path, sha256):
+    """True if `path` already holds the cached blob (a hardlink to it, or the same bytes)."""
+    from sox_cache import file_sha256 # Only the downloader needs the cache
+    try:
+        return os.path.samefile(path, blob_path) or (
+            os.path.getsize(path) == os.path.getsize(blob_path) and file_sha256(path) == sha256)
+    except OSError:
+        return False
+
+
+DOWNLOAD_WORKERS = 8 # parallel avatar downloads
+
+
+class _HostSessions:
+    """One keep-alive requests.Session per host, shared by all download threads.
+
+    Each session's connection pool is sized to the worker count so parallel
+    requests to the same CDN reuse TCP/TLS connections instead of opening new ones.
+    """
+    def __init__(self, requests, pool_size):
+        self._requests = requests
+        self._pool_size = pool_size
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._requests.Session()
+                adapter = self._requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[host] = session
+            return session
+
+    def close(self):
+        for session in self._sessions.values():
+            session.close()
+
+
+def _download_one(sessions, url, output_path, timeout, cache=None, cached_blob=None):
+    """Fetches one URL into output_path (runs on a pool thread). Exceptions go back to the caller.
+
+    A `cached_blob` is linked/copied instead of downloaded; fresh downloads
+    are added to `cache`.
+    """
+    if cached_blob is not None:
+        from sox_cache import link_or_copy # Only the downloader needs the cache
+        with sox_metrics.span("download", url=url, cached=True):
+            link_or_copy(cached_blob, output_path)
+        sox_metrics.count("download_cache_hits")
+        return
+    with sox_metrics.span("download", url=url), sessions.get(url).get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        with atomic_open(output_path, 'wb') as f: # A dropped connection leaves no truncated image
+            for chunk in response.iter_content(chunk_size=8192):
+                if chunk: # Filter out keep-alive chunks
+                    f.write(chunk)
+    if sox_metrics.enabled():
+        sox_metrics.count("downloads")
+        sox_metrics.count("bytes_downloaded", os.path.getsize(output_path))
+    if cache is not None:
+        try:
+            cache.store(url, output_path)
+        except OSError as e:
+            sox_log.warning(f"Could not add {url} to the avatar cache: {e}", "avatar_cache", url=url) # The download itself succeeded
+
+
+def download_avatars(urls, output_dir, progress=None, timeout=20, max_workers=DOWNLOAD_WORKERS, cache=None):
+    """Downloads each URL into output_dir using a bounded pool of worker threads.
+
+    Returns (download_count, failed_downloads) where failed_downloads maps
+    URL -> reason. `progress` (a Progress) is updated from the calling thread
+    as each URL finishes; Cancelled stops the run and drops queued URLs.
+
+    With a `cache` (a sox_cache.AvatarCache) URLs seen in earlier runs are
+    linked from the cache instead of downloaded, and a file already in
+    output_dir with the cached content is kept as is rather than duplicated
+    as name_1.ext. Cache hits count as downloads.
+    """
+    import requests # Only needed by the downloader
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    download_count = 0
+    processed_urls_count = 0
+    failed_downloads = {}
+    total_urls = len(urls)
+
+    # Output names are picked up front, in order, so the result does not depend on thread timing
+    names = NameAllocator()
+    jobs = []
+    for url in urls:
+        if not url.lower().startswith(('http://', 'https://')):
+            failed_downloads[url] = "Skipped: Does not appear to be a standard web URL (missing http/https)."
+            sox_log.repeated("avatar URLs skipped", "Skipping %s: Not a web URL.", url, level=sox_log.DEBUG)
+            processed_urls_count += 1
+            continue
+        cached = cache.lookup(url) if cache is not None else None
+        if cached is not None:
+            output_path = os.path.join(output_dir, _safe_filename_for_url(url))
+            if _is_cached_copy(output_path, *cached) and names.claim(output_path):
+                # Already there from an earlier run
+                download_count += 1
+                processed_urls_count += 1
+                sox_log.repeated("avatars already present", "Already present (cached): %s -> %s",
+                                 url, os.path.basename(output_path), level=sox_log.DEBUG)
+                continue
+        jobs.append((url, get_safe_filename_from_url(url, output_dir, names), cached[0] if cached else None))
+
+    sessions = _HostSessions(requests, max_workers)
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="avatar")
+    try:
+        futures = {executor.submit(_download_one, sessions, url, output_path, timeout, cache, blob): (url, output_path, blob)
+                   for url, output_path, blob in jobs}
+        if progress: progress.update(processed_urls_count, total_urls)
+        for future in as_completed(futures):
+            url, output_path, blob = futures[future]
+            try:
+                future.result()
+                download_count += 1
+                sox_log.repeated("avatars saved", "%s: %s -> %s", 'Copied from cache' if blob else 'Successfully downloaded',
+                                 url, os.path.basename(output_path), level=sox_log.DEBUG)
+            except requests.exceptions.Timeout:
+                failed_downloads[url] = f"Timeout occurred after {timeout} seconds."
+            except requests.exceptions.ConnectionError as e:
+                failed_downloads[url] = f"Connection error: {e}"
+            except requests.exceptions.HTTPError as e:
+                failed_downloads[url] = f"HTTP error: {e.response.status_code} {e.response.reason}"
+            except requests.exceptions.RequestException as e:
+                failed_downloads[url] = f"Request error: {e}"
+            except IOError as e:
+                failed_downloads[url] = f"File writing error: {e} (Path: {output_path})"
+            except Exception as e:
+                failed_downloads[url] = f"An unexpected error occurred during download: {e}"
+            if url in failed_downloads: # The caller reports these; the log gets the details in verbose mode
+                sox_log.repeated("avatar download failures", "Failed to download %s: %s", url, failed_downloads[url],
+                                 level=sox_log.DEBUG)
+
+            processed_urls_count += 1
+            if progress: progress.update(processed_urls_count, total_urls)
+    finally:
+        # On cancel/error, queued downloads are dropped; running ones finish before we return
+        executor.shutdown(wait=True, cancel_futures=True)
+        sessions.close()
+        if cache is not None:
+            try:
+                cache.save()
+            except OSError as e:
+                sox_log.warning(f"Could not save the avatar cache index: {e}", "avatar_cache")
+
+    if failed_downloads: sox_metrics.count("download_failures", len(failed_downloads))
+    return download_count, failed_downloads
+
+
+# --- 10. Account Migration (everything from one chat backup in one pass) ---
+@sox_metrics.timed("transform")
+def migrate_chat_backup(data, source_name=None, progress=None):
+    """Chat JSONL, character cards, scenario entry and avatar URLs from one loaded chat backup.
+
+    Replaces running the chat converter, both extractors and the avatar
+    scan separately, each of which loads the file again. Outputs come in
+    that order (chat first). The chat messages are still converted lazily
+    while the JSONL is written, and the URLs found in them are added to
+    result.avatar_urls then; the URLs of everything else are there
+    right away. A part that does not apply (e.g. no scenario) is reported in
+    result.errors; ConversionError is raised only if no part applies.
+    """
+    if not is_chat_json(data):
+        raise ConversionError("No valid Chat JSON data loaded or structure is invalid!")
+
+    result = ConversionResult()
+    # Everything except the messages is small: scan it now, the messages during the chat pass
+    find_image_urls({key: value for key, value in data.items() if key != 'messages'}, result.avatar_urls)
+
+    chat_converter = convert_multi_chat if is_multi_chat(data) else convert_single_chat
+    parts = [("chat", lambda: chat_converter(data, source_name, progress, result,
+                                              lambda message: find_image_urls(message, result.avatar_urls))),
+             ("characters", lambda: extract_characters(data))]
+    if has_chat_scenario(data): parts.append(("scenario", lambda: extract_chat_scenario(data)))
+
+    failures = []
+    for name, convert in parts:
+        try:
+            part = convert()
+        except ConversionError as e:
+            failures.append(f"{name}: {e}")
+            continue
+        if part is not result:
+            result.outputs.extend(part.outputs)
+            result.item_count += part.item_count
+            result.failed_count += part.failed_count
+            result.errors.extend(part.errors)
+            result.warnings.extend(part.warnings)
+
+    if not result.outputs:
+        raise ConversionError("Nothing could be migrated from this chat backup:\n" + "\n".join(failures))
+    result.errors.extend(failures)
+    return result
+
+
+# --- Converter registry (used by the batch CLI) ---
+# Every entry takes (data, source_name) and returns a ConversionResult.
+BATCH_CONVERTERS = {
+    "character": lambda data, source_name: convert_character(data),
+    "scenario": lambda data, source_name: convert_scenario(data),
+    "lorebook": convert_lorebook,
+    "single_chat": convert_single_chat,
+    "multi_chat": convert_multi_chat,
+    "char_extract": lambda data, source_name: extract_characters(data),
+    "chat_scenario_extract": lambda data, source_name: extract_chat_scenario(data),
+    "account_migration": migrate_chat_backup,
+}
+
+# Bump a converter's version whenever its output changes, so incremental batch
+# runs (sox_manifest) convert again what it already converted
+CONVERTER_VERSIONS = {
+    "character": 1,
+    "scenario": 1,
+    "lorebook": 1,
+    "single_chat": 2, # 2: compact JSONL records
+    "multi_chat": 2, # 2: compact JSONL records
+    "char_extract": 1,
+    "chat_scenario_extract": 1,
+    "account_migration": 2, # 2: compact JSONL records
+}
+
+# Keys only a Xoul character export carries (a scenario only has name + prompt; a persona may have a slug too)
+CHARACTER_KEYS = ("backstory", "greeting", "definition", "samples", "bio", "slug", "default_scenario")
+
+
+def is_multi_chat(data):
+    """Group chat backups tag messages with author_name/author_type instead of role."""
+    with closing_iter(data.get("messages", [])) as messages: # Only the first message is read
+        for message in messages:
+            if isinstance(message, dict):
+                return "author_type" in message
+    return len(data["conversation"].get("xouls", [])) > 1
+
+
+def detect_converters(data, extract=False):
+    """Returns the BATCH_CONVERTERS names that apply to a loaded JSON, most specific first.
+
+    With extract=True chat backups go through account_migration (chat,
+    characters and scenario in one pass). Persona files are not detected:
+    adding a persona needs a TavernAI backup as second input.
+    """
+    with sox_metrics.span("validate"):
+        return _detect_converters(data, extract)
+
+
+def skip_reason(data):
+    """Why an export no batch converter applies to is left out on purpose, or None.
+
+    Persona files and TavernAI persona backups only go through the HUB's
+    Persona Adding tool, which needs both at once.
+    """
+    if is_persona_backup(data) or _is_persona(data):
+        return "personas are not converted in batch"
+    return None
+
+
+def _is_persona(data):
+    # A persona (name, prompt, maybe slug and icon_url): a scenario's prompt comes with a
+    # prompt_spec, and a character has its own text fields instead of a prompt
+    return is_persona_json(data) and "prompt_spec" not in data and \
+        not any(key in data for key in ("backstory", "definition", "greeting"))
+
+
+def _detect_converters(data, extract):
+    if is_lorebook_json(data):
+        return ["lorebook"]
+    if is_chat_json(data):
+        if extract: return ["account_migration"]
+        return ["multi_chat" if is_multi_chat(data) else "single_chat"]
+    if has_chat_xouls(data):
+        names = ["char_extract"]
+        if has_chat_scenario(data): names.append("chat_scenario_extract")
+        return names
+    if _is_persona(data):
+        return []
+    if isinstance(data, dict) and any(key in data for key in CHARACTER_KEYS) and is_character_json(data):
+        return ["character"]
+    if is_scenario_json(data) and ("prompt" in data or "prompt_spec" in data):
+        return ["scenario"]
+    if is_character_json(data):
+        return ["character"]
+    return []
@@ -0,0 +1,120 @@
+"""JSON reading and writing for everything SOX loads and saves, on the fastest backend available.
+
+Parsing and encoding with the stdlib json module is a large part of the
+time spent on big chats and lorebooks. When orjson is installed it is used
+instead (several times faster at both); otherwise, or with the environment
+variable SOX_JSON_BACKEND=json, the stdlib does the work. Either way:
+
+- loads()/load() return the same Python values. Input orjson does not take
+  the way the stdlib does (integers beyond 64 bits, NaN, invalid UTF-8,
+  syntax errors) goes to the stdlib, so errors and messages are the
+  stdlib's too (json.JSONDecodeError / UnicodeDecodeError).
+- dumps()/dump() write UTF-8 text (no \\uXXXX escapes) in one of two
+  layouts: pretty (`indent` spaces per level, the card/lorebook format) or
+  compact (indent=None: one line without spaces, as SillyTavern writes its
+  own JSONL). Both backends give the same text, except that floats in
+  exponent notation read 1e16 on orjson where the stdlib writes 1e+16, and
+  non-finite floats become null rather than NaN/Infinity.
+  Values orjson cannot encode (integers beyond 64 bits, non-string keys)
+  go to the stdlib. ensure_ascii=True escapes non-ASCII characters
+  instead, like json.dump does by default; the standalone tools keep
+  their files' bytes that way. The stdlib writes those.
+"""
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKENDS = ("json", "orjson")
+
+# Digit runs of this length may be integers beyond 64 bits, which orjson would turn into floats
+_LONG_NUMBER = b'0' * 19
+_DIGITS_TO_ZERO = bytes(ord('0') if i in b'0123456789' else ord(' ') for i in range(256))
+_compact_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+_compact_ascii_encoder = json.JSONEncoder(separators=(',', ':'))
+_backend = None
+
+
+def set_backend(name):
+    """Selects "json" or "orjson" (raises ImportError if orjson is not installed)."""
+    global _backend
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown JSON backend {name!r} (expected one of {', '.join(BACKENDS)})")
+    if name == "orjson" and orjson is None:
+        raise ImportError("orjson is not installed")
+    _backend = name
+
+
+def backend():
+    """Name of the backend in use."""
+    return _backend
+
+
+def loads(data):
+    """Parses JSON from bytes (UTF-8) or str."""
+    if _backend == "orjson":
+        raw = data.encode('utf-8', 'surrogatepass') if isinstance(data, str) else data
+        # translate + substring search is several times faster than a regex over the whole document
+        if _LONG_NUMBER not in raw.translate(_DIGITS_TO_ZERO):
+            try:
+                return orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                pass # Let the stdlib parse it, or report the error its way
+    if isinstance(data, (bytes, bytearray)):
+        data = data.decode('utf-8')
+    return json.loads(data)
+
+
+def load(f):
+    """Parses a whole JSON file opened in binary or text mode."""
+    return loads(f.read())
+
+
+def _orjson_dumps(obj, indent):
+    if indent is None:
+        return orjson.dumps(obj).decode('utf-8')
+    encoded = orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    # orjson only indents by 2. Strings never contain a raw newline, so "\n" plus spaces is always
+    # indentation: widen it one level at a time (level n starts with 2n + (indent - 2)(n - 1) spaces
+    # once the levels above it are done), on the bytes, which is far cheaper than on the str
+    extra = b' ' * (indent - 2)
+    level = 1
+    while extra:
+        prefix = b'\n' + b' ' * (indent * level - len(extra))
+        if prefix not in encoded: break
+        encoded = encoded.replace(prefix, prefix + extra)
+        level += 1
+    return encoded.decode('utf-8')
+
+
+def dumps(obj, indent=None, ensure_ascii=False):
+    """Encodes obj as JSON text: pretty with `indent` spaces per level, or compact (indent=None)."""
+    if ensure_ascii:
+        if indent is None: return _compact_ascii_encoder.encode(obj)
+        return json.dumps(obj, indent=indent)
+    if _backend == "orjson" and (indent is None or (indent >= 2 and indent % 2 == 0)):
+        try:
+            return _orjson_dumps(obj, indent)
+        except TypeError:
+            pass # Beyond orjson (huge int, non-string key...): the stdlib can still write it
+    if indent is None:
+        return _compact_encoder.encode(obj)
+    return json.dumps(obj, indent=indent, ensure_ascii=False)
+
+
+def dump(obj, f, indent=None, ensure_ascii=False):
+    """Writes obj as JSON to a text file (see dumps)."""
+    f.write(dumps(obj, indent, ensure_ascii))
+
+
+def _default_backend():
+    requested = os.environ.get("SOX_JSON_BACKEND", "").strip().lower()
+    if requested in BACKENDS and (requested == "json" or orjson is not None):
+        return requested
+    return "orjson" if orjson is not None else "json"
+
+
+_backend = _default_backend()
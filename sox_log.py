@@ -0,0 +1,215 @@
+"""Buffered console and file logging for the engine and tools, cheap enough for per-message loops.
+
+The converters used to print() a line for every skipped message, bad role
+or unparsable timestamp, and the downloader one per URL. On a dirty export
+that is thousands of writes, and on a slow terminal (or a Windows console)
+they cost more than the conversion. Instead:
+
+    debug() / info() / warning() / error()
+               one-off messages, dropped below the configured level
+    repeated(kind, message, *args)
+               a problem that can happen once per message, section or URL.
+               Only the first SAMPLES occurrences of each kind are formatted
+               and kept; the rest are just counted, and flush() sums them up
+               as "2,314 timestamp parse failures, first 5 shown:"
+    flush()    writes what is waiting, with those summaries (sox_cli calls
+               it after each input file, the HUB after each job)
+
+Console lines are buffered and written BUFFER_RECORDS at a time; errors go
+out at once. With verbose on, every repeated() occurrence is written as it
+happens (nothing is aggregated). A file sink gets the same records as JSON
+Lines ({"time", "level", "event", "message", "pid", ...fields}) from its
+own level on, so a run can keep everything on file with a quiet console.
+
+configure() sets all this up; the environment variables SOX_LOG_LEVEL
+(debug, info, warning, error), SOX_VERBOSE=1 and SOX_LOG_FILE=<path> do
+the same for any tool.
+"""
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+
+DEBUG, INFO, WARNING, ERROR = 10, 20, 30, 40
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+_PREFIXES = {DEBUG: "", INFO: "", WARNING: "Warning: ", ERROR: "Error: "}
+
+SAMPLES = 5 # occurrences of each repeated() kind shown before they are only counted
+BUFFER_RECORDS = 100 # console/file records held before they are written
+
+_lock = threading.RLock()
+_level = INFO # console
+_verbose = False
+_file = None # binary file object of the file sink
+_file_path = None
+_file_level = DEBUG
+_threshold = INFO # lowest level any sink takes
+_pending = [] # (time, level, message, event, fields, indented) waiting to be written
+_repeated = {} # kind -> [level, count, sampled records]
+
+
+def configure(level=None, verbose=None, file=None, file_level=None):
+    """Sets the console level (a LEVELS name or number), verbose mode and the file sink (a path, or "" to close it).
+
+    Arguments left at None keep their current value. Verbose also lowers the console level to DEBUG.
+    """
+    global _level, _verbose, _file, _file_path, _file_level, _threshold
+    with _lock:
+        _write_pending()
+        if level is not None: _level = LEVELS[level.lower()] if isinstance(level, str) else level
+        if verbose is not None: _verbose = verbose
+        if file_level is not None: _file_level = LEVELS[file_level.lower()] if isinstance(file_level, str) else file_level
+        if file is not None and file != _file_path:
+            if _file is not None: _file.close()
+            _file, _file_path = None, None
+            if file:
+                # Unbuffered append: each flush is one write, so processes sharing the file do not interleave lines
+                _file, _file_path = open(file, 'ab', buffering=0), file
+        if _verbose: _level = DEBUG
+        _threshold = min(_level, _file_level) if _file is not None else _level
+
+
+def settings():
+    """The current configure() arguments, for a worker process to apply."""
+    return {"level": _level, "verbose": _verbose, "file": _file_path or "", "file_level": _file_level}
+
+
+def verbose():
+    return _verbose
+
+
+def reset():
+    """Drops what is waiting without writing it (a forked worker would otherwise repeat its parent's records)."""
+    with _lock:
+        _pending.clear()
+        _repeated.clear()
+
+
+def is_enabled_for(level):
+    """True if a message at `level` would be written anywhere (to skip building costly ones)."""
+    return level >= _threshold
+
+
+def log(level, message, event=None, **fields):
+    """Queues `message`; `event` (a short name) and `fields` are only written to the file sink."""
+    if level < _threshold: return
+    with _lock:
+        _pending.append((time.time(), level, message, event, fields, False))
+        if level >= ERROR or len(_pending) >= BUFFER_RECORDS: _write_pending()
+
+
+def debug(message, event=None, **fields):
+    log(DEBUG, message, event, **fields)
+
+
+def info(message, event=None, **fields):
+    log(INFO, message, event, **fields)
+
+
+def warning(message, event=None, **fields):
+    log(WARNING, message, event, **fields)
+
+
+def error(message, event=None, **fields):
+    log(ERROR, message, event, **fields)
+
+
+def repeated(kind, message, *args, level=WARNING):
+    """One occurrence of a problem of `kind`, a plural noun phrase ("timestamp parse failures").
+
+    `message % args` is only formatted for the occurrences that are shown
+    (the first SAMPLES of the kind until the next flush(), or all of them
+    when verbose); the others only add to the count.
+    """
+    if level < _threshold: return
+    with _lock:
+        entry = _repeated.get(kind)
+        if entry is None: entry = _repeated[kind] = [level, 0, []]
+        entry[1] += 1
+        if _verbose:
+            _pending.append((time.time(), level, message % args if args else message, kind, {}, False))
+            if len(_pending) >= BUFFER_RECORDS: _write_pending()
+        elif entry[1] <= SAMPLES:
+            entry[2].append((time.time(), level, message % args if args else message, kind, {}, False))
+
+
+def counts():
+    """{kind: occurrences} of the repeated() problems since the last flush()."""
+    with _lock:
+        return {kind: entry[1] for kind, entry in _repeated.items()}
+
+
+def details_hint():
+    """Where a message box can send users for the problems logged through repeated() (e.g. "see the console ...")."""
+    where = f"console and {_file_path}" if _file is not None else "console"
+    if _verbose: return f"see the {where} for details"
+    return f"the first {SAMPLES} of each kind are in the {where}; set SOX_VERBOSE=1 to list them all"
+
+
+def flush(context=None):
+    """Writes everything waiting, summing up each repeated() kind; `context` (e.g. the input file) heads the sums."""
+    with _lock:
+        for kind, (level, occurrences, samples) in _repeated.items():
+            if _verbose: continue # Already written one by one
+            if occurrences > len(samples):
+                where = f"{context}: " if context else ""
+                _pending.append((time.time(), level, f"{where}{occurrences:,} {kind}, first {len(samples)} shown:",
+                                 kind, {"count": occurrences, "shown": len(samples)}, False))
+                _pending.extend(record[:5] + (True,) for record in samples)
+            else:
+                _pending.extend(samples)
+        _repeated.clear()
+        _write_pending()
+
+
+def _write_pending():
+    """Writes the queued records to the sinks that take them (caller holds _lock)."""
+    if not _pending: return
+    stream = sys.stdout # Looked up each time: it may be replaced, or None (pythonw)
+    if stream is not None:
+        lines = [("    " if indented else _PREFIXES[level]) + message
+                 for _, level, message, _, _, indented in _pending if level >= _level]
+        if lines:
+            try:
+                stream.write("\n".join(lines) + "\n")
+                stream.flush()
+            except (OSError, ValueError):
+                pass # Console gone (closed pipe, detached window): the file sink still gets everything
+    if _file is not None:
+        pid = os.getpid()
+        lines = []
+        for stamp, level, message, event, fields, _ in _pending:
+            if level < _file_level: continue
+            record = {"time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(stamp)) + f".{int(stamp % 1 * 1000):03d}",
+                      "level": _level_name(level), "event": event, "message": message, "pid": pid}
+            record.update(fields)
+            lines.append(json.dumps(record, ensure_ascii=False, default=str))
+        if lines:
+            try:
+                _file.write(("\n".join(lines) + "\n").encode('utf-8'))
+            except OSError:
+                pass
+    _pending.clear()
+
+
+def _level_name(level):
+    for name, number in LEVELS.items():
+        if number == level: return name.upper()
+    return str(level)
+
+
+def _configure_from_environment():
+    level = os.environ.get("SOX_LOG_LEVEL", "").strip().lower()
+    path = os.environ.get("SOX_LOG_FILE")
+    try:
+        configure(level=level if level in LEVELS else None,
+                  verbose=os.environ.get("SOX_VERBOSE", "").strip().lower() in ("1", "true", "yes", "on") or None,
+                  file=path or None)
+    except OSError as e:
+        print(f"Could not open the log file {path}: {e}")
+
+
+_configure_from_environment()
+atexit.register(flush)
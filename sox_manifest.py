@@ -0,0 +1,147 @@
+"""Manifest of what a batch run converted, so the next run only redoes what changed.
+
+Re-running sox_cli over the same exports (after fixing one bad file, or for
+a nightly re-sync) used to convert everything again. The manifest is kept as
+.sox_manifest.json in the output directory and records, per input:
+
+    "<absolute input path>": {
+        "sha256": "...", "size": 1234, "mtime_ns": ...,  # the content that was converted
+        "extract": false, "compact": false,              # --extract/--compact settings of that run
+        "converters": {"single_chat": 1},                # name -> sox_engine.CONVERTER_VERSIONS
+        "outputs": ["Bob/chat.jsonl"],                   # relative to the output directory
+        "reused": ["Bob.json"],                          # cards another input wrote (see sox_dedup)
+        "cards": [["bob-1", "<card hash>", "Bob.json"]], # identity, hash and file of its xoul cards
+        "avatar_urls": ["https://..."]
+    }
+
+An input is up to date when its content hash, the --extract/--compact settings and the
+versions of its converters are unchanged and all its outputs (and the
+cards it reused) still exist. A
+plain file whose size and mtime match the record is not even hashed again;
+archive members always are (that still costs far less than converting).
+"""
+import hashlib
+import os
+
+import sox_archive
+import sox_json
+from sox_engine import CONVERTER_VERSIONS
+from sox_output import atomic_open
+
+MANIFEST_NAME = ".sox_manifest.json"
+FORMAT_VERSION = 2 # 1 listed reused cards among the outputs
+
+
+def input_key(source):
+    return os.path.abspath(source)
+
+
+def fingerprint(source, previous=None):
+    """{"sha256", "size", "mtime_ns"} of an input file or ArchiveMember.
+
+    `previous` is its manifest entry, if any; for a plain file with the same
+    size and mtime its hash is reused instead of reading the file.
+    """
+    if not isinstance(source, sox_archive.ArchiveMember):
+        stat = os.stat(source)
+        if previous and previous.get("size") == stat.st_size and previous.get("mtime_ns") == stat.st_mtime_ns:
+            return {"sha256": previous["sha256"], "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        size, mtime_ns = stat.st_size, stat.st_mtime_ns
+    else:
+        size, mtime_ns = sox_archive.file_size(source), None
+    digest = hashlib.sha256()
+    with sox_archive.open_binary(source) as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return {"sha256": digest.hexdigest(), "size": size, "mtime_ns": mtime_ns}
+
+
+def is_current(previous, current, extract, compact=False):
+    """True if an input with manifest entry `previous` and fingerprint `current` needs no conversion."""
+    if not previous or not current or previous.get("sha256") != current["sha256"]:
+        return False
+    if previous.get("extract") != extract or previous.get("compact", False) != compact:
+        return False
+    if not previous.get("outputs") and not previous.get("reused"):
+        return False
+    if any(CONVERTER_VERSIONS.get(name) != version for name, version in previous.get("converters", {}).items()):
+        return False
+    return all(os.path.exists(path) for path in previous["outputs"] + previous.get("reused", []))
+
+
+class Manifest:
+    """The manifest of one output directory.
+
+    A missing or unreadable manifest starts out empty, and so does one
+    opened with `fresh` (every input then gets converted and recorded anew).
+    """
+    def __init__(self, output_dir, fresh=False):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self._entries = {} if fresh else self._load()
+        self._owners = {} # output or reused card (relative) -> number of entries listing it
+        for entry in self._entries.values():
+            self._count_outputs(entry, 1)
+        self._dirty = fresh
+
+    def _load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                manifest = sox_json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(manifest, dict) or manifest.get("version") != FORMAT_VERSION:
+            return {}
+        inputs = manifest.get("inputs")
+        return inputs if isinstance(inputs, dict) else {}
+
+    def _count_outputs(self, entry, delta):
+        for output in entry.get("outputs", []) + entry.get("reused", []):
+            self._owners[output] = self._owners.get(output, 0) + delta
+
+    def lookup(self, source):
+        """The entry of an input with absolute paths (as convert_file uses them), or None."""
+        entry = self._entries.get(input_key(source))
+        if entry is None: return None
+        entry = dict(entry)
+        for field in ("outputs", "reused"):
+            entry[field] = [os.path.join(self.output_dir, output) for output in entry.get(field, [])]
+        entry["cards"] = [[identity, digest, os.path.join(self.output_dir, path)]
+                          for identity, digest, path in entry.get("cards", [])]
+        return entry
+
+    def record(self, summary, extract, compact=False):
+        """Stores what converting `summary.path` produced. Returns the outputs of its previous
+        entry that no input lists any more (absolute paths, for the caller to delete).
+
+        Inputs that were not converted cleanly are dropped, so the next run tries them again.
+        """
+        key = input_key(summary.path)
+        old = self._entries.pop(key, None)
+        if old is not None: self._count_outputs(old, -1)
+        if summary.ok and summary.fingerprint:
+            entry = dict(summary.fingerprint)
+            entry["extract"] = extract
+            entry["compact"] = compact
+            entry["converters"] = {name: CONVERTER_VERSIONS.get(name) for name in summary.converters}
+            # Cards another input wrote are listed apart: they are kept while this input needs
+            # them, but are not its own to free or overwrite when it is converted again
+            entry["outputs"] = [os.path.relpath(path, self.output_dir) for path in summary.written]
+            entry["reused"] = [os.path.relpath(path, self.output_dir) for path in summary.reused]
+            entry["cards"] = [[identity, digest, os.path.relpath(path, self.output_dir)]
+                              for identity, digest, path in summary.cards]
+            entry["avatar_urls"] = sorted(summary.avatar_urls)
+            self._entries[key] = entry
+            self._count_outputs(entry, 1)
+        self._dirty = self._dirty or old != self._entries.get(key)
+        if old is None: return []
+        return [os.path.join(self.output_dir, output) for output in old.get("outputs", [])
+                if not self._owners.get(output)]
+
+    def save(self):
+        """Writes the manifest (atomically) if anything changed."""
+        if not self._dirty: return
+        os.makedirs(self.output_dir, exist_ok=True)
+        with atomic_open(self.path) as f:
+            sox_json.dump({"version": FORMAT_VERSION, "inputs": self._entries}, f)
+        self._dirty = False
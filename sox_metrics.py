@@ -0,0 +1,323 @@
+"""Run instrumentation: time per stage, counters and optional profiles, reported as JSON.
+
+When a conversion is slow the scattered print() calls say little about
+where the time went. The engine, the output writers and the avatar
+downloader report into this module instead:
+
+    spans      time per named stage: "load", "validate", "transform",
+               "encode", "write", "download" (count, total and longest)
+    counters   "messages", "bytes_read", "bytes_written", "files_written",
+               "downloads"... (report() adds a per-second rate for each)
+
+Everything is off until enable() is called (sox_cli --report, or the
+SOX_REPORT environment variable for any tool); until then span() is a
+shared no-op and count() returns at once. enable() can also start cProfile
+(of the calling thread) and tracemalloc, whose top entries go into the
+report.
+
+Span totals add up the time spent in each stage, by every thread: JSON
+Lines batches are encoded on the converting thread while an earlier batch
+is written by a background one, so stage totals can exceed the wall time.
+A span nested in a span of the same name (a converter calling another)
+is not counted twice. Chats above the streaming threshold are parsed
+while they are converted, so their parsing counts as "transform".
+
+With `trace` enable() also keeps every span as a timed slice on the track
+of the process and thread that ran it, which write_trace() saves in the
+Chrome trace-event format: open it in https://ui.perfetto.dev or
+chrome://tracing to see each input file, converter, stage and avatar
+download on its worker's timeline (stragglers, idle workers, I/O
+stalls). Time recorded with record() (the chat message loop) has no
+slice of its own and shows as the gaps between encode/write slices.
+Slice times are wall-clock based so the tracks of different processes
+line up.
+
+Worker processes (sox_cli -j) send take() back with each result and the
+parent merge()s it.
+"""
+import atexit
+import contextlib
+import functools
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+import sox_json
+
+REPORT_VERSION = 1
+TOP_ENTRIES = 25 # functions / allocation sites listed from the profiles
+MAX_TRACE_EVENTS = 500000 # later slices are dropped (and counted) to bound memory
+
+_lock = threading.Lock()
+_local = threading.local() # .active: names of the spans open on this thread
+_enabled = False
+_spans = {} # name -> [count, total seconds, longest]
+_counters = {}
+_started = None # (time.time(), time.perf_counter()) of enable()
+_profiler = None
+_memory = False
+_NO_SPAN = contextlib.nullcontext()
+_tracing = False
+_events = [] # (name, category, start us, duration us, pid, tid, args) of the trace
+_track_names = {} # (pid, tid) -> thread name; (pid, None) -> process name
+_dropped_events = 0
+_clock_offset = time.time() - time.perf_counter() # perf_counter() + this = wall clock time
+
+
+def enabled():
+    return _enabled
+
+
+def enable(profile=False, memory=False, trace=False):
+    """Starts collecting (again from zero); `profile` runs cProfile on this thread, `memory` tracemalloc,
+    `trace` keeps the slices for write_trace()."""
+    global _enabled, _started, _profiler, _memory, _tracing
+    reset()
+    _tracing = _tracing or trace
+    _started = (time.time(), time.perf_counter())
+    if profile and _profiler is None:
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    if memory and not _memory:
+        import tracemalloc
+        tracemalloc.start()
+        _memory = True
+    _enabled = True
+
+
+def tracing():
+    return _enabled and _tracing
+
+
+def set_process_name(name):
+    """Names this process's track in the trace (default: the script name)."""
+    with _lock:
+        _track_names[os.getpid(), None] = name
+
+
+def reset():
+    global _dropped_events
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        _events.clear()
+        _dropped_events = 0
+
+
+def _add_event(name, category, start, seconds, args):
+    global _dropped_events
+    thread = threading.current_thread()
+    pid, tid = os.getpid(), thread.ident
+    with _lock:
+        if len(_events) >= MAX_TRACE_EVENTS:
+            _dropped_events += 1
+            return
+        _events.append((name, category, round((start + _clock_offset) * 1e6, 1), round(seconds * 1e6, 1),
+                        pid, tid, args))
+        if (pid, tid) not in _track_names: _track_names[pid, tid] = thread.name
+
+
+class _Span:
+    __slots__ = ("name", "category", "args", "start", "nested")
+
+    def __init__(self, name, category="stage", args=None):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        active = getattr(_local, "active", None)
+        if active is None: active = _local.active = set()
+        self.nested = self.name in active
+        if not self.nested: active.add(self.name)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self.nested:
+            seconds = time.perf_counter() - self.start
+            record(self.name, seconds)
+            if _tracing: _add_event(self.name, self.category, self.start, seconds, self.args)
+            _local.active.discard(self.name)
+        return False
+
+
+def span(name, category="stage", **args):
+    """Context manager timing a stage (a no-op while disabled). `category` and `args`
+    (e.g. the file name) only show in the trace."""
+    return _Span(name, category, args or None) if _enabled else _NO_SPAN
+
+
+def timed(name):
+    """Decorator: every call of the function is a span `name`."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled: return func(*args, **kwargs)
+            with _Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record(name, seconds, calls=1):
+    """Adds time measured by the caller (e.g. summed over a loop) to span `name`."""
+    if not _enabled: return
+    with _lock:
+        stats = _spans.get(name)
+        if stats is None: _spans[name] = [calls, seconds, seconds]
+        else:
+            stats[0] += calls
+            stats[1] += seconds
+            if seconds > stats[2]: stats[2] = seconds
+
+
+def count(name, amount=1):
+    """Adds `amount` to counter `name`."""
+    if not _enabled: return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def take():
+    """The spans, counters and slices collected so far, which are then cleared (for a worker to send back)."""
+    global _dropped_events
+    with _lock:
+        snapshot = {"spans": {name: list(stats) for name, stats in _spans.items()}, "counters": dict(_counters)}
+        if _tracing:
+            snapshot["events"] = list(_events)
+            snapshot["track_names"] = [[pid, tid, name] for (pid, tid), name in _track_names.items()]
+            snapshot["dropped_events"] = _dropped_events
+        _spans.clear()
+        _counters.clear()
+        _events.clear()
+        _dropped_events = 0
+    return snapshot
+
+
+def merge(snapshot):
+    """Adds a take() from another process."""
+    global _dropped_events
+    if not _enabled or not snapshot: return
+    with _lock:
+        if _tracing:
+            room = max(MAX_TRACE_EVENTS - len(_events), 0)
+            events = [tuple(event) for event in snapshot.get("events", [])]
+            _events.extend(events[:room])
+            _dropped_events += snapshot.get("dropped_events", 0) + max(len(events) - room, 0)
+            for pid, tid, name in snapshot.get("track_names", []):
+                _track_names.setdefault((pid, tid), name)
+        for name, (calls, seconds, longest) in snapshot["spans"].items():
+            stats = _spans.setdefault(name, [0, 0.0, 0.0])
+            stats[0] += calls
+            stats[1] += seconds
+            stats[2] = max(stats[2], longest)
+        for name, amount in snapshot["counters"].items():
+            _counters[name] = _counters.get(name, 0) + amount
+
+
+def _profile_entries():
+    import pstats
+    stats = pstats.Stats(_profiler).stats
+    entries = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_ENTRIES]
+    return [{"function": f"{os.path.basename(file)}:{line}({function})", "calls": calls,
+             "own_s": round(own, 6), "cumulative_s": round(cumulative, 6)}
+            for (file, line, function), (_, calls, own, cumulative, _) in entries]
+
+
+def _memory_entries():
+    import tracemalloc
+    current, peak = tracemalloc.get_traced_memory()
+    sites = tracemalloc.take_snapshot().statistics('lineno')[:TOP_ENTRIES]
+    return {"current_bytes": current, "peak_bytes": peak,
+            "top_sites": [{"site": f"{os.path.basename(stat.traceback[0].filename)}:{stat.traceback[0].lineno}",
+                           "bytes": stat.size, "blocks": stat.count} for stat in sites]}
+
+
+def report():
+    """The run report: timing per stage, counters with rates, and the profiles that are on."""
+    started_at, started = _started or (time.time(), time.perf_counter())
+    wall = time.perf_counter() - started
+    with _lock:
+        spans = {name: {"count": calls, "total_s": round(total, 6), "max_s": round(longest, 6),
+                        "mean_s": round(total / calls, 6) if calls else 0.0}
+                 for name, (calls, total, longest) in sorted(_spans.items())}
+        counters = dict(sorted(_counters.items()))
+    result = {
+        "version": REPORT_VERSION,
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(started_at)),
+        "wall_s": round(wall, 6),
+        "spans": spans,
+        "counters": counters,
+        "rates": {f"{name}_per_s": round(value / wall, 3) for name, value in counters.items()} if wall > 0 else {},
+    }
+    if _profiler is not None:
+        _profiler.disable()
+        result["profile"] = _profile_entries()
+        _profiler.enable()
+    if _memory: result["memory"] = _memory_entries()
+    return result
+
+
+def write_report(path):
+    """Writes report() to `path` as indented JSON."""
+    from sox_output import atomic_open # sox_output reports into this module
+    with atomic_open(path) as f:
+        sox_json.dump(report(), f, indent=2)
+
+
+def trace_events():
+    """The trace in Chrome trace-event form: {"traceEvents": [...], ...}, times relative to enable()."""
+    origin = (_started[0] if _started else time.time()) * 1e6
+    with _lock:
+        events = list(_events)
+        track_names = dict(_track_names)
+        dropped = _dropped_events
+    default_name = os.path.basename(sys.argv[0]) if sys.argv and sys.argv[0] else "python"
+    track_names.setdefault((os.getpid(), None), default_name)
+    trace = []
+    for (pid, tid), name in sorted(track_names.items(), key=lambda item: (item[0][0], item[0][1] or 0)):
+        if tid is None: trace.append({"name": "process_name", "ph": "M", "pid": pid, "args": {"name": name}})
+        else: trace.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}})
+    for name, category, start, duration, pid, tid, args in events:
+        event = {"name": name, "cat": category, "ph": "X", "ts": round(start - origin, 1), "dur": duration,
+                 "pid": pid, "tid": tid}
+        if args: event["args"] = args
+        trace.append(event)
+    return {"traceEvents": trace, "displayTimeUnit": "ms",
+            "otherData": {"started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(origin / 1e6)),
+                          "dropped_events": dropped}}
+
+
+def write_trace(path):
+    """Writes trace_events() to `path` (compact JSON; traces get large)."""
+    from sox_output import atomic_open
+    with atomic_open(path) as f:
+        sox_json.dump(trace_events(), f)
+
+
+def _write_at_exit(write, path, what):
+    def write_at_exit():
+        if multiprocessing.parent_process() is not None: return # A worker: its numbers went to the parent
+        try:
+            write(path)
+        except OSError as e:
+            print(f"Could not write the {what} {path}: {e}")
+    atexit.register(write_at_exit)
+
+
+def _enable_from_environment():
+    """SOX_REPORT=<path> turns collection on for any tool and writes the report at exit;
+    SOX_PROFILE=cpu, memory or cpu,memory adds the profiles. SOX_TRACE=<path> likewise writes a trace."""
+    report_path, trace_path = os.environ.get("SOX_REPORT"), os.environ.get("SOX_TRACE")
+    if not report_path and not trace_path: return
+    profiles = {part.strip().lower() for part in os.environ.get("SOX_PROFILE", "").split(",")}
+    enable(profile="cpu" in profiles, memory="memory" in profiles, trace=bool(trace_path))
+    if report_path: _write_at_exit(write_report, report_path, "run report")
+    if trace_path: _write_at_exit(write_trace, trace_path, "trace")
+
+
+_enable_from_environment()
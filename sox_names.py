@@ -0,0 +1,94 @@
+"""Output file names: one sanitizer and one collision-safe allocator for every writer.
+
+Each tool used to pick names its own way. The avatar downloader probed
+os.path.exists() for name, name_1, name_2... on every file, and the
+extractors simply overwrote a file whose sanitized name came up twice.
+Here a NameAllocator lists each target directory once, then hands out
+names from memory under a lock:
+
+    names = NameAllocator()
+    path = names.allocate(output_dir, "Bob.json")  # Bob.json, else Bob_1.json, Bob_2.json...
+
+so worker threads sharing it can never be given the same path, and
+allocating a name costs no filesystem access.
+"""
+import os
+import re
+import threading
+
+
+def sanitize(name, fallback):
+    """Turns a character/scenario name, or a file name taken from a URL, into a safe file name.
+
+    Anything but letters, digits, "-", "_" and "." becomes "_". A name that
+    ends up empty or all dots gives `fallback`.
+    """
+    safe_name = re.sub(r'[^\w\-\.]', '_', name or "")
+    return safe_name if safe_name.strip('.') else fallback
+
+
+class NameAllocator:
+    """Hands out unique output paths, per directory, safe to share between threads.
+
+    With `snapshot` (the default) the files already in a directory, listed
+    once on its first use, count as taken; without it only the names given
+    out by this allocator do (a batch re-run then replaces its earlier
+    outputs). Names are compared with os.path.normcase.
+    """
+    def __init__(self, snapshot=True):
+        self.snapshot = snapshot
+        self._lock = threading.Lock()
+        self._on_disk = {} # directory -> normcased names listed from it
+        self._taken = set() # normcased paths given out (or claimed)
+        self._next_suffix = {} # normcased base path + ext -> next _N to try
+
+    def _existing(self, directory):
+        names = self._on_disk.get(directory)
+        if names is None:
+            names = set()
+            if self.snapshot:
+                try:
+                    names = {os.path.normcase(name) for name in os.listdir(directory or '.')}
+                except OSError:
+                    pass # Not created yet: nothing in it
+            self._on_disk[directory] = names
+        return names
+
+    def _is_free(self, directory, path):
+        key = os.path.normcase(path)
+        return key not in self._taken and os.path.normcase(os.path.basename(path)) not in self._existing(directory)
+
+    def allocate(self, directory, name):
+        """Reserves and returns a path in `directory` for `name`, adding _1, _2... if it is taken."""
+        path = os.path.join(directory, name)
+        with self._lock:
+            if not self._is_free(directory, path):
+                base_name, file_ext = os.path.splitext(path)
+                series = os.path.normcase(base_name + file_ext)
+                counter = self._next_suffix.get(series, 1)
+                path = f"{base_name}_{counter}{file_ext}"
+                while not self._is_free(directory, path):
+                    counter += 1
+                    path = f"{base_name}_{counter}{file_ext}"
+                self._next_suffix[series] = counter + 1
+            self._taken.add(os.path.normcase(path))
+        return path
+
+    def claim(self, path):
+        """Reserves an existing path for reuse. Returns False if it was already given out or claimed."""
+        key = os.path.normcase(path)
+        with self._lock:
+            if key in self._taken: return False
+            self._taken.add(key)
+            return True
+
+    def is_taken(self, path):
+        """True if the path was given out or claimed (and not released)."""
+        with self._lock:
+            return os.path.normcase(path) in self._taken
+
+    def release(self, path):
+        """Makes a path given out or claimed earlier available again."""
+        with self._lock:
+            self._taken.discard(os.path.normcase(path))
+            self._next_suffix.clear() # Its _N may be free again
@@ -0,0 +1,369 @@
+"""Output sinks for converted TavernAI data.
+
+JsonlWriter is the JSON Lines sink used for chats: converters yield one
+message at a time and the writer encodes them in batches, handing each batch
+to a background thread for the actual file write. Disk latency then overlaps
+with parsing/conversion, and a converted chat is never held in memory as a
+whole.
+
+BundleWriter is the sink for a whole batch: every output goes into one
+.zip or .tar(.gz/.bz2/.xz) archive laid out like a SillyTavern data
+directory, instead of thousands of loose files.
+
+atomic_open() is how every output file gets written: into a temporary file
+next to it that only replaces the real one once complete, so a crash never
+leaves a truncated card or chat. How hard it pushes the data to disk is
+the process-wide fsync policy (set_fsync_policy):
+
+    "file"   fsync every file (and its folder) as it is finished; safest, slowest
+    "batch"  finished files are fsynced together by sync_pending(), called at
+             the end of a batch/job (and at exit); the default
+    "never"  leave it to the OS
+"""
+import atexit
+import contextlib
+import io
+import os
+import queue
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+
+import sox_json
+import sox_metrics
+
+BATCH_SIZE = 512 # records encoded per write
+FSYNC_POLICIES = ("file", "batch", "never")
+SPOOL_SIZE = 8 * 1024 * 1024 # bundle members up to this size are staged in memory, larger ones in a temp file
+
+# Bundle file extension -> tarfile write mode (None: zip)
+BUNDLE_MODES = {'.zip': None, '.tar': 'w', '.tar.gz': 'w:gz', '.tgz': 'w:gz', '.tar.bz2': 'w:bz2',
+                '.tbz2': 'w:bz2', '.tar.xz': 'w:xz', '.txz': 'w:xz'}
+
+_fsync_policy = "batch"
+_pending = set() # paths finished since the last sync_pending() ("batch" policy)
+_pending_lock = threading.Lock()
+
+
+def set_fsync_policy(policy):
+    """Sets the fsync policy of this process: "file", "batch" or "never"."""
+    global _fsync_policy
+    if policy not in FSYNC_POLICIES:
+        raise ValueError(f"Unknown fsync policy {policy!r} (expected one of {', '.join(FSYNC_POLICIES)})")
+    _fsync_policy = policy
+
+
+def get_fsync_policy():
+    return _fsync_policy
+
+
+def _fsync_path(path):
+    """fsyncs a file or directory by path (directories cannot be opened on Windows; skipped there)."""
+    if os.path.isdir(path) and os.name == 'nt': return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def mark_written(path):
+    """Applies the fsync policy to a file finished at `path` (written, or renamed into place)."""
+    if _fsync_policy == "file":
+        _fsync_path(path)
+        _fsync_path(os.path.dirname(os.path.abspath(path)))
+    elif _fsync_policy == "batch":
+        with _pending_lock:
+            _pending.add(os.path.abspath(path))
+
+
+def sync_pending():
+    """fsyncs every file finished under the "batch" policy since the last call, then their folders.
+
+    Files removed or renamed since are skipped. Returns the number of files synced.
+    """
+    with _pending_lock:
+        paths = sorted(_pending)
+        _pending.clear()
+    synced = 0
+    for path in paths:
+        try:
+            _fsync_path(path)
+            synced += 1
+        except FileNotFoundError:
+            pass
+    for directory in sorted({os.path.dirname(path) for path in paths}):
+        try:
+            _fsync_path(directory)
+        except FileNotFoundError:
+            pass
+    return synced
+
+
+atexit.register(sync_pending)
+
+
+@contextlib.contextmanager
+def atomic_open(path, mode='w', encoding='utf-8', newline=''):
+    """Opens a temporary file next to `path` for writing; it replaces `path` when the block ends normally.
+
+    If the block raises, the temporary file is deleted and `path` is left as
+    it was. The fsync policy is applied once the file is in place.
+    """
+    directory, name = os.path.split(path)
+    temp_path = os.path.join(directory, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    binary = 'b' in mode
+    f = open(temp_path, mode) if binary else open(temp_path, mode, encoding=encoding, newline=newline)
+    try:
+        yield f
+        with sox_metrics.span("write"):
+            f.flush()
+            if _fsync_policy == "file": os.fsync(f.fileno())
+        if sox_metrics.enabled():
+            sox_metrics.count("files_written")
+            sox_metrics.count("bytes_written", os.fstat(f.fileno()).st_size)
+    except BaseException:
+        f.close()
+        _remove_quietly(temp_path)
+        raise
+    f.close()
+    try:
+        os.replace(temp_path, path)
+    except BaseException:
+        _remove_quietly(temp_path)
+        raise
+    if _fsync_policy == "file": _fsync_path(os.path.dirname(os.path.abspath(path)))
+    elif _fsync_policy == "batch": mark_written(path)
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class JsonlWriter:
+    """Buffered JSON Lines sink over an open text file.
+
+    Each record is one line of compact JSON (sox_json.dumps(record))
+    followed by '\\n'.
+    """
+    def __init__(self, f, batch_size=BATCH_SIZE, background=True):
+        self._f = f
+        self._batch_size = batch_size
+        self._encode = sox_json.dumps
+        self._pending = []
+        self._error = None
+        self._queue = None
+        self._thread = None
+        self.count = 0
+        if background:
+            # Small bound so a slow disk throttles the producer instead of buffering the whole chat
+            self._queue = queue.Queue(maxsize=4)
+            self._thread = threading.Thread(target=self._drain, name="JsonlWriter", daemon=True)
+            self._thread.start()
+
+    def _drain(self):
+        while True:
+            batch = self._queue.get()
+            if batch is None: return
+            if self._error is None:
+                try:
+                    with sox_metrics.span("write"):
+                        self._f.write(batch)
+                except Exception as e:
+                    self._error = e # Keep draining so the producer never blocks; reported on close()
+
+    def _raise_pending_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def write(self, record):
+        self._pending.append(record)
+        self.count += 1
+        if len(self._pending) >= self._batch_size:
+            self.flush()
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        if self._pending:
+            with sox_metrics.span("encode"):
+                batch = '\n'.join(map(self._encode, self._pending)) + '\n'
+            self._pending = []
+            if self._queue is not None:
+                self._raise_pending_error()
+                self._queue.put(batch)
+            else:
+                with sox_metrics.span("write"):
+                    self._f.write(batch)
+
+    def close(self):
+        """Writes out everything still buffered and stops the writer thread."""
+        try:
+            self.flush()
+        finally:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+                self._thread = None
+        self._raise_pending_error()
+
+    def abort(self):
+        """Stops the writer thread without flushing (used when the producer failed)."""
+        self._pending = []
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None: self.close()
+        else: self.abort()
+        return False
+
+
+def write_jsonl(records, f, batch_size=BATCH_SIZE):
+    """Writes an iterable of records to an open text file as JSON Lines. Returns the record count."""
+    with JsonlWriter(f, batch_size) as writer:
+        writer.write_all(records)
+    return writer.count
+
+
+def bundle_suffix(path):
+    """The bundle extension `path` ends with (longest match, e.g. ".tar.gz"), or None."""
+    lower = path.lower()
+    for suffix in sorted(BUNDLE_MODES, key=len, reverse=True):
+        if lower.endswith(suffix): return suffix
+    return None
+
+
+class BundleWriter:
+    """Writes files into a single .zip / .tar(.gz/.bz2/.xz) bundle, finalized atomically.
+
+    Everything goes to a hidden ".part" file next to `path`, which replaces
+    `path` only when close() succeeds; abort() (or leaving a `with` block on
+    an exception) deletes it, so a failed run never leaves a truncated
+    bundle behind. Member names are "folder/name"; a name already in the
+    bundle gets _1, _2... like loose outputs do. Not thread safe.
+    """
+    def __init__(self, path):
+        suffix = bundle_suffix(path)
+        if suffix is None:
+            raise ValueError(f"Not a bundle file name: {path}")
+        self.path = path
+        self.temp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.part")
+        self.names = [] # member names in the order they were added
+        self._reserved = set() # lowercased, so the bundle also extracts cleanly on Windows/macOS
+        self._error = None
+        mode = BUNDLE_MODES[suffix]
+        if mode is None:
+            self._archive = zipfile.ZipFile(self.temp_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+        else:
+            self._archive = tarfile.open(self.temp_path, mode)
+
+    def _reserve(self, name):
+        base_name, file_ext = os.path.splitext(name)
+        counter = 1
+        while name.lower() in self._reserved:
+            name = f"{base_name}_{counter}{file_ext}"
+            counter += 1
+        self._reserved.add(name.lower())
+        return name
+
+    def _add_stream(self, name, f, size):
+        """Copies `size` bytes from `f` into the bundle as member `name`."""
+        if self._error is not None:
+            raise OSError(f"The bundle could not be written: {self._error}")
+        try:
+            with sox_metrics.span("write"):
+                self._write_member(name, f, size)
+        except Exception as e:
+            self._error = e # A half-written member leaves the archive unusable
+            raise
+        sox_metrics.count("files_written")
+        sox_metrics.count("bytes_written", size)
+        self.names.append(name)
+        return name
+
+    def _write_member(self, name, f, size):
+        if isinstance(self._archive, zipfile.ZipFile):
+            info = zipfile.ZipInfo(name, time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with self._archive.open(info, 'w', force_zip64=size > zipfile.ZIP64_LIMIT) as member:
+                shutil.copyfileobj(f, member)
+        else:
+            info = tarfile.TarInfo(name) # tar needs the size in the header, before the data
+            info.size = size
+            info.mtime = int(time.time())
+            info.mode = 0o644
+            self._archive.addfile(info, f)
+
+    def add(self, name, data, is_jsonl=False, indent=4):
+        """Adds `data` as JSON (or JSON Lines) member `name`. Returns the member name actually used.
+
+        The content is the same as sox_engine.save_json() would write. For
+        JSON Lines `data` may be a generator; its records are spooled (in
+        memory, then a temp file past SPOOL_SIZE) and only added once
+        producing them succeeded, so a failing converter adds nothing.
+        """
+        if is_jsonl:
+            with tempfile.SpooledTemporaryFile(SPOOL_SIZE) as spool:
+                text = io.TextIOWrapper(spool, encoding='utf-8', newline='')
+                write_jsonl([data] if isinstance(data, dict) else data, text)
+                text.flush()
+                text.detach()
+                size = spool.tell()
+                spool.seek(0)
+                return self._add_stream(self._reserve(name), spool, size)
+        with sox_metrics.span("encode"):
+            encoded = sox_json.dumps(data, indent).encode('utf-8')
+        return self._add_stream(self._reserve(name), io.BytesIO(encoded), len(encoded))
+
+    def add_file(self, name, source_path):
+        """Adds an existing file as member `name`. Returns the member name actually used."""
+        with open(source_path, 'rb') as f:
+            return self._add_stream(self._reserve(name), f, os.fstat(f.fileno()).st_size)
+
+    def close(self):
+        """Finishes the archive and moves it to its final path."""
+        if self._archive is None: return
+        try:
+            if self._error is not None:
+                raise OSError(f"The bundle could not be written: {self._error}")
+            self._archive.close()
+            self._archive = None
+            if _fsync_policy != "never": _fsync_path(self.temp_path) # One file: "batch" is the same as "file"
+            os.replace(self.temp_path, self.path)
+            if _fsync_policy != "never": _fsync_path(os.path.dirname(os.path.abspath(self.path)))
+        except BaseException:
+            self.abort()
+            raise
+
+    def abort(self):
+        """Discards the bundle; nothing is left at `path` or at the temporary path."""
+        if self._archive is not None:
+            try:
+                self._archive.close()
+            except Exception:
+                pass
+            self._archive = None
+        _remove_quietly(self.temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None: self.close()
+        else: self.abort()
+        return False
@@ -0,0 +1,166 @@
+"""Incremental JSON reading for very large XoulAI exports.
+
+json.load materializes a whole chat backup at once; a multi-hundred-MB group
+chat then needs several times its size in memory. This module walks the file
+with a small sliding buffer instead:
+
+    data = load_skeleton("chat.json", "messages")
+    data["conversation"]            # loaded normally (it is small)
+    for message in data["messages"]: # a StreamedArray, read item by item
+        ...
+
+A loop that may stop early should iterate through closing_iter(), so the
+file is closed at once rather than whenever the iterator is collected.
+
+Only one array item is held in memory at a time, so peak memory stays
+roughly constant regardless of chat length. Works on archive members too
+(see sox_archive). Plain stdlib, no extra packages.
+"""
+import contextlib
+import json
+
+from sox_archive import open_text
+
+CHUNK_SIZE = 1 << 16
+_WHITESPACE = ' \t\n\r'
+_decoder = json.JSONDecoder()
+
+
+class _Scanner:
+    """Sliding-window tokenizer over a text file, built on JSONDecoder.raw_decode."""
+    def __init__(self, f):
+        self.f = f
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size=CHUNK_SIZE):
+        """Appends the next chunk to the buffer, dropping what was already consumed."""
+        if self.eof: return False
+        chunk = self.f.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        if self.pos > CHUNK_SIZE:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    def peek(self):
+        """Returns the next non-whitespace character without consuming it ('' at end of file)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf): return self.buf[self.pos]
+            if not self._fill(): return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            self._error(f"Expecting '{char}'")
+        self.pos += 1
+
+    def value(self):
+        """Decodes the next complete JSON value, reading more of the file as needed."""
+        self.peek()
+        size = CHUNK_SIZE
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+                # A number (or true/false/null) that ends exactly at the buffer edge may be cut short
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof: raise
+            # Value spans past the buffer: read more, growing the read size for big values
+            self._fill(size)
+            size *= 2
+
+    def _error(self, msg):
+        raise json.JSONDecodeError(msg, self.buf, self.pos)
+
+
+def _iter_object(scanner):
+    """Yields the keys of the JSON object at the scanner; the caller consumes each value."""
+    scanner.expect('{')
+    if scanner.peek() == '}':
+        scanner.pos += 1
+        return
+    while True:
+        key = scanner.value()
+        if not isinstance(key, str): scanner._error("Expecting property name")
+        scanner.expect(':')
+        yield key
+        char = scanner.peek()
+        scanner.pos += 1
+        if char == '}': return
+        if char != ',': scanner._error("Expecting ',' delimiter")
+
+
+def _iter_array(scanner):
+    """Yields the items of the JSON array at the scanner one at a time."""
+    scanner.expect('[')
+    if scanner.peek() == ']':
+        scanner.pos += 1
+        return
+    while True:
+        yield scanner.value()
+        char = scanner.peek()
+        scanner.pos += 1
+        if char == ']': return
+        if char != ',': scanner._error("Expecting ',' delimiter")
+
+
+def iter_array_items(filename, key):
+    """Yields the items of the top-level array `key` of a JSON object file, one at a time."""
+    with open_text(filename) as f:
+        scanner = _Scanner(f)
+        for name in _iter_object(scanner):
+            if name == key and scanner.peek() == '[':
+                yield from _iter_array(scanner)
+                return
+            scanner.value()
+
+
+class StreamedArray:
+    """Lazy stand-in for a large top-level array; every iteration re-reads it from the file."""
+    def __init__(self, filename, key, length):
+        self.filename = filename
+        self.key = key
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return iter_array_items(self.filename, self.key)
+
+
+def closing_iter(items):
+    """Context manager giving iter(items); a StreamedArray's file is closed when the block ends."""
+    iterator = iter(items)
+    return contextlib.closing(iterator) if hasattr(iterator, "close") else contextlib.nullcontext(iterator)
+
+
+def load_skeleton(filename, stream_key):
+    """Loads a JSON object file, replacing the top-level array `stream_key` with a StreamedArray.
+
+    The array is walked once here (item by item, to count it and check the
+    syntax) but never kept in memory.
+    """
+    data = {}
+    with open_text(filename) as f:
+        scanner = _Scanner(f)
+        if scanner.peek() != '{':
+            # Not an object: nothing to stream, fall back to a plain load
+            return scanner.value()
+        for name in _iter_object(scanner):
+            if name == stream_key and scanner.peek() == '[':
+                length = sum(1 for _ in _iter_array(scanner))
+                data[name] = StreamedArray(filename, name, length)
+            else:
+                data[name] = scanner.value()
+        if scanner.peek() != '':
+            scanner._error("Extra data")
+    return data
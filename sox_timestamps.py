@@ -0,0 +1,101 @@
+"""Timestamp normalization for the chat converters.
+
+Every chat message carries a timestamp that TavernAI shows as
+"Month Day, Year Hour:Minuteam/pm". The general parser (string fixups,
+re.split, datetime.fromisoformat, strftime) is costly when run once per
+message, yet the output only depends on the date, hour and minute, and the
+messages of a chat share those in long runs. So the ISO shapes Xoul emits,
+
+    2024-05-01T10:00:00Z
+    2024-05-01T10:00:00.123456+00:00
+
+are recognized by one precompiled pattern and formatted from an LRU memo of
+the date part ("May 01, 2024 ") plus a table of the 1440 clock times.
+Anything else (epoch numbers, unusual offsets or fractions, invalid dates)
+takes the general path, so results and error messages are unchanged.
+"""
+import re
+from datetime import datetime
+from functools import lru_cache
+
+DATE_FORMAT = "%B %d, %Y "
+CLOCK_FORMAT = "%I:%M%p"
+OUTPUT_FORMAT = DATE_FORMAT + CLOCK_FORMAT
+MEMO_SIZE = 4096 # distinct days remembered
+
+# Strict: only shapes datetime.fromisoformat accepts on every supported Python
+_XOUL_ISO = re.compile(r'\d{4}-\d{2}-\d{2}T(?:[01]\d|2[0-3]):[0-5]\d:[0-5]\d(?:\.\d{3}(?:\d{3})?)?'
+                       r'(?:Z|[+-](?:[01]\d|2[0-3]):[0-5]\d)?')
+_OFFSET = re.compile(r'([+-]\d{2}:\d{2})')
+
+
+def _format_datetime(dt_object):
+    return dt_object.strftime(OUTPUT_FORMAT).replace('AM', 'am').replace('PM', 'pm') # lowercase am/pm
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _format_date(date):
+    """Formats the date half ("Month Day, Year ") of a "YYYY-MM-DD" string, or None if it is not a valid date."""
+    try:
+        return datetime(int(date[0:4]), int(date[5:7]), int(date[8:10])).strftime(DATE_FORMAT)
+    except ValueError:
+        return None
+
+
+def _build_clock():
+    """"HH:MM" -> "hh:mmam" for every minute of the day (the time half of OUTPUT_FORMAT)."""
+    clock = {}
+    for hour in range(24):
+        for minute in range(60):
+            formatted = datetime(2000, 1, 1, hour, minute).strftime(CLOCK_FORMAT)
+            clock[f"{hour:02d}:{minute:02d}"] = formatted.replace('AM', 'am').replace('PM', 'pm')
+    return clock
+
+
+_CLOCK = _build_clock()
+
+
+def format_timestamp_slow(raw_timestamp):
+    """The general parser, used for every shape the fast path does not cover."""
+    if isinstance(raw_timestamp, (int, float)):
+        # Assuming integer/float timestamps are Unix timestamps (seconds since epoch)
+        dt_object = datetime.fromtimestamp(raw_timestamp)
+    elif isinstance(raw_timestamp, str) and raw_timestamp:
+        # Handle potential 'Z' timezone indicator by replacing with +00:00
+        if raw_timestamp.endswith('Z'):
+            iso_timestamp_str = raw_timestamp[:-1] + '+00:00'
+        else:
+            iso_timestamp_str = raw_timestamp
+
+        # Append .000000 to timestamps that lack microseconds but have a +HH:MM/-HH:MM offset
+        if '.' not in iso_timestamp_str and ('+' in iso_timestamp_str or '-' in iso_timestamp_str):
+            parts = _OFFSET.split(iso_timestamp_str)
+            if len(parts) == 3: # Should be [datetime_part, timezone_offset, '']
+                iso_timestamp_str = parts[0] + '.000000' + parts[1]
+
+        try:
+            dt_object = datetime.fromisoformat(iso_timestamp_str)
+        except ValueError as e:
+            raise ValueError(f"{e} (processed as '{iso_timestamp_str}')")
+    else:
+        return ""
+
+    return _format_datetime(dt_object)
+
+
+def format_timestamp(raw_timestamp):
+    """Formats a Xoul timestamp as "Month Day, Year Hour:Minuteam/pm".
+
+    Returns "" for a missing timestamp and raises ValueError when it cannot be parsed.
+    """
+    if isinstance(raw_timestamp, str) and _XOUL_ISO.fullmatch(raw_timestamp):
+        date = _format_date(raw_timestamp[:10])
+        if date is not None: return date + _CLOCK[raw_timestamp[11:16]]
+    return format_timestamp_slow(raw_timestamp)
+
+
+def clear_memo():
+    """Forgets memoized dates and clock times (e.g. after the locale used for month names changed)."""
+    global _CLOCK
+    _format_date.cache_clear()
+    _CLOCK = _build_clock()
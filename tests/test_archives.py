@@ -0,0 +1,66 @@
+"""Batch conversion of exports packed in .zip and .tar.gz archives."""
+import json
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+import sox_cli
+import synth_exports
+
+EXPORTS = synth_exports.make_exports(messages=300, sections=50) # A full export, personas included
+CONVERTED = [name for name in EXPORTS if not name.startswith("persona")]
+
+
+def _pack(directory, stem):
+    """Writes the exports into stem.zip and stem.tar.gz in `directory`."""
+    os.makedirs(directory, exist_ok=True)
+    with zipfile.ZipFile(os.path.join(directory, f"{stem}.zip"), 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, document in EXPORTS.items():
+            archive.writestr(name, json.dumps(document))
+    sources = os.path.join(directory, f"{stem}_files")
+    os.makedirs(sources)
+    with tarfile.open(os.path.join(directory, f"{stem}.tar.gz"), 'w:gz') as archive:
+        for name, document in EXPORTS.items():
+            with open(os.path.join(sources, name), 'w', encoding='utf-8') as f:
+                json.dump(document, f)
+            archive.add(os.path.join(sources, name), arcname=name)
+
+
+def _tree(directory):
+    files = {}
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name.startswith("."): continue
+            with open(os.path.join(root, name), 'rb') as f:
+                files[os.path.relpath(os.path.join(root, name), directory)] = f.read()
+    return files
+
+
+@pytest.mark.parametrize("jobs", ["2", "4"])
+def test_parallel_workers_read_archives_like_one(tmp_path, capsys, jobs):
+    inputs = str(tmp_path / "in")
+    for stem in ("first", "second", "third"): _pack(inputs, stem)
+    archives = [os.path.join(inputs, name) for name in sorted(os.listdir(inputs)) if not name.endswith("_files")]
+    serial, parallel = str(tmp_path / "serial"), str(tmp_path / "parallel")
+    assert sox_cli.main([*archives, "-o", serial, "-j", "1"]) == 0
+    assert sox_cli.main([*archives, "-o", parallel, "-j", jobs]) == 0
+    out = capsys.readouterr().out
+    assert "[ERROR]" not in out
+    assert out.count("[SKIPPED]") == 2 * len(archives) * (len(EXPORTS) - len(CONVERTED))
+    assert _tree(parallel) == _tree(serial)
+
+
+def test_archives_with_one_name_get_their_own_folders(tmp_path, capsys):
+    inputs, output = str(tmp_path / "in"), str(tmp_path / "out")
+    _pack(inputs, "export")
+    os.makedirs(os.path.join(inputs, "export")) # A folder of loose exports with the same name
+    with open(os.path.join(inputs, "export", "character.json"), 'w', encoding='utf-8') as f:
+        json.dump(EXPORTS["character.json"], f)
+    assert sox_cli.main([inputs, "-o", output, "-j", "1"]) == 0
+    files = _tree(output)
+    folders = {path.split(os.sep)[0] for path in files}
+    assert folders == {"export", "export_zip", "export_tar_gz", "export_files"}
+    for folder in ("export_zip", "export_tar_gz"):
+        assert len([path for path in files if path.startswith(folder + os.sep)]) == len(CONVERTED)
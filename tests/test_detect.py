@@ -0,0 +1,39 @@
+"""Which batch converters sox_engine.detect_converters picks for each export shape."""
+import pytest
+
+import sox_engine
+import synth_exports
+
+EXPORTS = synth_exports.make_exports(messages=4, sections=3)
+
+
+@pytest.mark.parametrize("name, extract, expected", [
+    ("character.json", False, ["character"]),
+    ("scenario.json", False, ["scenario"]),
+    ("lorebook.json", False, ["lorebook"]),
+    ("single_chat.json", False, ["single_chat"]),
+    ("group_chat.json", False, ["multi_chat"]),
+    ("single_chat.json", True, ["account_migration"]),
+    ("persona_backup.json", False, []),
+])
+def test_exports(name, extract, expected):
+    assert sox_engine.detect_converters(EXPORTS[name], extract) == expected
+
+
+def test_persona_is_not_a_scenario():
+    persona = EXPORTS["persona.json"]
+    assert set(persona) == {"name", "icon_url", "prompt"}
+    assert sox_engine.detect_converters(persona) == []
+    assert sox_engine.detect_converters({"name": "Ash", "prompt": "A quiet archivist."}) == []
+    assert sox_engine.detect_converters(dict(persona, slug="ash-1")) == []
+
+
+@pytest.mark.parametrize("name", sorted(EXPORTS))
+def test_only_personas_are_skipped_on_purpose(name):
+    reason = sox_engine.skip_reason(EXPORTS[name])
+    assert (reason is not None) == name.startswith("persona")
+
+
+def test_scenario_with_only_a_prompt_spec():
+    scenario = {key: value for key, value in EXPORTS["scenario.json"].items() if key != "prompt"}
+    assert sox_engine.detect_converters(scenario) == ["scenario"]
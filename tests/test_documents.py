@@ -0,0 +1,31 @@
+"""Read-only documents shared through sox_documents."""
+import json
+
+import pytest
+
+import sox_documents
+import sox_json
+
+
+def test_every_level_is_read_only():
+    document = sox_documents.freeze({"conversation": {"xouls": [{"name": "Kael"}]},
+                                     "messages": [{"content": str(i)} for i in range(5000)]})
+    for message in document["messages"]:
+        with pytest.raises(TypeError): message["content"] = ""
+    with pytest.raises(TypeError): document["messages"][-1]["content"] = ""
+    with pytest.raises(TypeError): document.get("conversation")["xouls"][0].update(name="Lux")
+    with pytest.raises(TypeError): document.copy()["conversation"]["xouls"].append({})
+    for key, value in document.items():
+        assert isinstance(value, (sox_documents.FrozenDict, sox_documents.FrozenList))
+
+
+def test_copies_and_serialization_keep_the_content():
+    parsed = {"a": {"b": [1, {"c": 2.5}, "é"]}, "d": []}
+    expected = json.loads(json.dumps(parsed))
+    document = sox_documents.freeze(parsed)
+    assert document.get("missing", []) == [] and "missing" not in document
+    assert json.loads(sox_json.dumps(document)) == expected
+    assert json.loads(json.dumps(dict(document))) == expected
+    copy = document.copy()
+    copy["d"] = None
+    assert document["d"] == []
@@ -0,0 +1,77 @@
+"""Incremental sox_cli runs over the same output directory."""
+import json
+import os
+
+import sox_cli
+import synth_exports
+
+CHATS = ("single_chat.json", "group_chat.json")
+
+
+def _write_chats(directory):
+    os.makedirs(directory)
+    for name in CHATS:
+        document = synth_exports.make_exports(messages=20, sections=5)[name]
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+            json.dump(document, f)
+
+
+def _convert(inputs, output, *options):
+    assert sox_cli.main([inputs, "-o", output, "--extract", *options]) == 0
+    with open(os.path.join(output, ".sox_manifest.json"), encoding='utf-8') as f:
+        return json.load(f)["inputs"]
+
+
+def _entry(manifest, inputs, name):
+    return manifest[os.path.abspath(os.path.join(inputs, name))]
+
+
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _edit_backstory(path, backstory):
+    document = _read(path)
+    for xoul in document["conversation"]["xouls"]: xoul["backstory"] = backstory
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f)
+
+
+def test_edited_input_does_not_overwrite_cards_it_reused(tmp_path):
+    inputs, output = str(tmp_path / "in"), str(tmp_path / "out")
+    _write_chats(inputs)
+    manifest = _convert(inputs, output, "-j", "1")
+    group = _entry(manifest, inputs, "group_chat.json")
+    single = _entry(manifest, inputs, "single_chat.json")
+    # Both chats have the same first xoul: the second input reuses the card the first wrote
+    shared = [path for path in single["reused"] if path in group["outputs"]]
+    assert shared and not set(single["outputs"]) & set(group["outputs"])
+    before = {path: _read(os.path.join(output, path)) for path in group["outputs"] if path.endswith(".json")}
+
+    _edit_backstory(os.path.join(inputs, "single_chat.json"), "CHANGED BACKSTORY")
+    manifest = _convert(inputs, output, "-j", "1")
+
+    assert _entry(manifest, inputs, "group_chat.json")["outputs"] == group["outputs"]
+    for path, card in before.items():
+        assert _read(os.path.join(output, path)) == card
+    single = _entry(manifest, inputs, "single_chat.json")
+    assert not single["reused"]
+    changed = [path for path in single["outputs"]
+               if path.endswith(".json") and "CHANGED BACKSTORY" in json.dumps(_read(os.path.join(output, path)))]
+    assert changed and not set(changed) & set(before)
+
+
+def test_skipped_inputs_keep_their_cards_known(tmp_path):
+    inputs, output = str(tmp_path / "in"), str(tmp_path / "out")
+    _write_chats(inputs)
+    first = _convert(inputs, output, "-j", "1")
+    # A forced-fresh run is the reference; an up-to-date rerun must describe the same files
+    for jobs in ("1", "2"):
+        manifest = _convert(inputs, output, "-j", jobs)
+        for name in CHATS:
+            entry, previous = _entry(manifest, inputs, name), _entry(first, inputs, name)
+            for field in ("outputs", "reused", "cards"):
+                assert entry[field] == previous[field]
+    written = {path for name in CHATS for path in _entry(first, inputs, name)["outputs"]}
+    assert written == {name for name in os.listdir(output) if not name.startswith(".")}
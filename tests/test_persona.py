@@ -0,0 +1,22 @@
+"""Persona keys written by sox_engine.add_persona."""
+import hashlib
+import re
+
+import pytest
+
+import sox_engine
+
+
+def _baseline_key(name):
+    """The key the HUB's Add Persona tool built before sox_names existed."""
+    base = re.sub(r'[^\w\-_\. ]', '_', name).replace(' ', '_')
+    if not base or base.startswith('.'): base = f"persona_{hashlib.md5(name.encode()).hexdigest()[:8]}"
+    return f"{base}.png"
+
+
+@pytest.mark.parametrize("name", ["Ash", "Ash Grey", "  Ash  ", "Ash/Grey: II?", "Zoë Ä", "...", ".hidden", "名前 です"])
+def test_persona_key_matches_the_baseline(name):
+    backup = {"personas": {}, "persona_descriptions": {}}
+    result = sox_engine.add_persona(backup, {"name": name, "prompt": "A quiet archivist."})
+    personas = result.outputs[0].data["personas"]
+    assert personas == {_baseline_key(name): name}
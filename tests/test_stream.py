@@ -0,0 +1,37 @@
+"""Streamed chat messages (sox_stream.StreamedArray) are closed when a loop stops early."""
+import json
+
+import pytest
+
+import sox_engine
+import sox_stream
+import synth_exports
+
+
+@pytest.fixture
+def iterators(monkeypatch):
+    """Every iterator handed out by a StreamedArray, kept alive so the test can check it was closed."""
+    started = []
+    iterate = sox_stream.StreamedArray.__iter__
+    monkeypatch.setattr(sox_stream.StreamedArray, "__iter__", lambda self: started.append(iterate(self)) or started[-1])
+    return started
+
+
+def _streamed_chat(tmp_path, messages):
+    path = tmp_path / "group_chat.json"
+    path.write_text(json.dumps(synth_exports.make_exports(messages=messages, sections=1)["group_chat.json"]),
+                    encoding='utf-8')
+    return sox_engine.load_json(str(path), "messages")
+
+
+def test_is_multi_chat_closes_the_file(tmp_path, iterators):
+    assert sox_engine.is_multi_chat(_streamed_chat(tmp_path, 20))
+    assert len(iterators) == 1 and iterators[0].gi_frame is None
+
+
+def test_cancelled_conversion_closes_the_file(tmp_path, iterators):
+    progress = sox_engine.Progress(lambda done, total: progress.cancel())
+    result = sox_engine.convert_multi_chat(_streamed_chat(tmp_path, 2 * sox_engine.PROGRESS_EVERY), progress=progress)
+    with pytest.raises(sox_engine.Cancelled):
+        list(result.outputs[0].data)
+    assert len(iterators) == 1 and iterators[0].gi_frame is None